@@ -0,0 +1,147 @@
+from typing import Dict, Optional, Tuple, Union
+
+from web3 import Web3
+from web3.types import Address, ChecksumAddress
+
+FEE_DENOMINATOR = 10000
+
+
+class InsufficientLiquidityError(ValueError):
+    pass
+
+
+def sort_tokens(
+    token_a: Union[Address, ChecksumAddress, str],
+    token_b: Union[Address, ChecksumAddress, str],
+) -> tuple:
+    """
+    Sorts token addresses the same way Uniswap V2 style pairs order token0 & token1
+    Args:
+        token_a (AddressLike): Token address
+        token_b (AddressLike): Token address
+
+    Returns (tuple): Sorted token addresses
+
+    """
+    return (
+        (token_a, token_b)
+        if str(token_a).lower() < str(token_b).lower()
+        else (token_b, token_a)
+    )
+
+
+def compute_pair_address(
+    factory: str,
+    token_a: Union[Address, ChecksumAddress, str],
+    token_b: Union[Address, ChecksumAddress, str],
+    init_code_hash: str,
+) -> str:
+    """
+    Derives the address a Uniswap V2 style factory deploys a pair at with CREATE2, whether or not it exists yet
+    Args:
+        factory (str): Factory address
+        token_a (AddressLike): Token address
+        token_b (AddressLike): Token address
+        init_code_hash (str): Keccak hash of the factory's pair creation code
+
+    Returns (str): Checksum pair address
+
+    """
+    token_0, token_1 = sort_tokens(token_a, token_b)
+    salt = Web3.keccak(hexstr=f"{token_0[2:]}{token_1[2:]}")
+    address = Web3.keccak(
+        hexstr=f"ff{factory[2:]}{Web3.toHex(salt)[2:]}{init_code_hash[2:]}"
+    )[12:]
+    return Web3.toChecksumAddress(Web3.toHex(address))
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int, fee: int) -> int:
+    """
+    Maximum output amount of a swap given the pair reserves, fees included
+    Args:
+        amount_in (int): Input amount in wei
+        reserve_in (int): Pair reserve of input token
+        reserve_out (int): Pair reserve of output token
+        fee (int): Swap fee in basis points
+
+    Returns (int): Output amount in wei
+
+    """
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        raise InsufficientLiquidityError("Insufficient liquidity")
+    amount_in_with_fee = amount_in * (FEE_DENOMINATOR - fee)
+    return (amount_in_with_fee * reserve_out) // (
+        reserve_in * FEE_DENOMINATOR + amount_in_with_fee
+    )
+
+
+def get_amount_in(amount_out: int, reserve_in: int, reserve_out: int, fee: int) -> int:
+    """
+    Required input amount of a swap to receive the given output amount, fees included
+    Args:
+        amount_out (int): Output amount in wei
+        reserve_in (int): Pair reserve of input token
+        reserve_out (int): Pair reserve of output token
+        fee (int): Swap fee in basis points
+
+    Returns (int): Input amount in wei
+
+    """
+    if amount_out <= 0 or reserve_in <= 0 or reserve_out <= amount_out:
+        raise InsufficientLiquidityError("Insufficient liquidity")
+    return (reserve_in * amount_out * FEE_DENOMINATOR) // (
+        (reserve_out - amount_out) * (FEE_DENOMINATOR - fee)
+    ) + 1
+
+
+class ReservesCache:
+    """
+    Pair reserves refreshed at most once per block. Pairs whose reserves can't be read, e.g. pairs that were never
+    created, are cached too so they aren't queried again within the block
+    """
+
+    def __init__(self):
+        self.reserves: Dict[Tuple[str, str], Tuple[int, Optional[Tuple[int, int]]]] = {}
+
+    def has(self, network: str, pair: str, block_number: int) -> bool:
+        """
+        Verifies pair was fetched at the given block
+        Args:
+            network (str): Network name
+            pair (str): Pair address
+            block_number (int): Current block number
+
+        Returns (bool): True if cached entry is current
+
+        """
+        entry = self.reserves.get((network, pair))
+        return entry is not None and entry[0] >= block_number
+
+    def get(
+        self, network: str, pair: str, block_number: int
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Retrieves cached reserves of pair if they were fetched at the given block
+        Args:
+            network (str): Network name
+            pair (str): Pair address
+            block_number (int): Current block number
+
+        Returns (Optional[tuple]): Reserves of token0 & token1. None if not cached or reserves can't be read
+
+        """
+        if not self.has(network=network, pair=pair, block_number=block_number):
+            return None
+        return self.reserves[(network, pair)][1]
+
+    def set(
+        self,
+        network: str,
+        pair: str,
+        reserves: Optional[Tuple[int, int]],
+        block_number: int,
+    ) -> None:
+        self.reserves[(network, pair)] = (block_number, reserves)
+
+
+reserves_cache = ReservesCache()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from requests.exceptions import RequestException
+from web3 import Web3
+
+from api.rpc import batch_request
+from app import logger
+from services.block_watcher import BlockWatcher
+
+APPROVAL_TOPIC = Web3.toHex(Web3.keccak(text="Approval(address,address,uint256)"))
+MAX_APPROVAL = int(
+    "0x000000000000000fffffffffffffffffffffffffffffffffffffffffffffffff", 16
+)
+
+# Spending lowers the allowance of some tokens & emits Approval, so only a large drop means approval was revoked
+MIN_CACHED_ALLOWANCE = MAX_APPROVAL // 2
+
+# Approvals unused for this long are dropped, so Approval events are only watched for wallets that keep trading
+APPROVAL_CACHE_TTL = 60 * 60
+
+
+def address_topic(address: str) -> str:
+    return f"0x{address[2:].lower():0>64}"
+
+
+class ApprovalCache:
+    """
+    Remembers (wallet, token, router) approvals so repeat swaps skip allowance checks. Approval events of cached
+    wallets are watched every block & drop entries once allowance falls below MIN_CACHED_ALLOWANCE. Approvals expire
+    when unused, so wallets that stopped trading aren't watched forever
+    """
+
+    def __init__(self, network: str, web3: Web3, block_watcher: BlockWatcher):
+        self.network = network
+        self.web3 = web3
+        self.block_watcher = block_watcher
+        # Last time each approval was used
+        self.approvals: Dict[Tuple[str, str, str], float] = {}
+        self.last_block = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def is_approved(self, wallet: str, token: str, router: str) -> bool:
+        key = (wallet, Web3.toChecksumAddress(token), router)
+
+        if key not in self.approvals:
+            return False
+        self.approvals[key] = time.monotonic()
+        return True
+
+    def add(self, wallet: str, token: str, router: str) -> None:
+        """
+        Caches approval
+        Args:
+            wallet (str): Token owner
+            token (str): Token contract address
+            router (str): Approved spender
+
+        """
+        key = (wallet, Web3.toChecksumAddress(token), router)
+        self.approvals[key] = time.monotonic()
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def clear(self, wallet: str, token: str, router: str) -> None:
+        self.approvals.pop((wallet, Web3.toChecksumAddress(token), router), None)
+
+    def expire(self) -> None:
+        """Drops approvals unused for APPROVAL_CACHE_TTL"""
+        expires_before = time.monotonic() - APPROVAL_CACHE_TTL
+
+        for key in [
+            key for key, used_at in self.approvals.items() if used_at < expires_before
+        ]:
+            del self.approvals[key]
+
+    async def run(self) -> None:
+        """
+        Drops cached approvals lowered by Approval events while there are cached approvals. Leaves the block watcher
+        once every approval was cleared or expired
+        """
+        async for block_number in self.block_watcher.blocks():
+            self.expire()
+
+            if not self.approvals:
+                break
+            from_block = self.last_block + 1 if self.last_block else block_number
+            self.last_block = block_number
+            owners = {wallet for wallet, _, _ in self.approvals}
+            spenders = {router for _, _, router in self.approvals}
+            try:
+                logs = await batch_request(
+                    web3=self.web3,
+                    method="eth_getLogs",
+                    params=[
+                        {
+                            "fromBlock": hex(from_block),
+                            "toBlock": hex(block_number),
+                            "topics": [
+                                APPROVAL_TOPIC,
+                                [address_topic(owner) for owner in owners],
+                                [address_topic(spender) for spender in spenders],
+                            ],
+                        }
+                    ],
+                )
+            except (RequestException, ValueError) as e:
+                logger.exception(e)
+                continue
+
+            for log in logs:
+                owner, spender = (
+                    Web3.toChecksumAddress(f"0x{topic[-40:]}")
+                    for topic in log["topics"][1:3]
+                )
+
+                if int(log["data"], 16) < MIN_CACHED_ALLOWANCE:
+                    logger.info("Approval of %s for %s lowered", log["address"], owner)
+                    self.clear(wallet=owner, token=log["address"], router=spender)
+        self.last_block = 0
+
+
+approval_caches: Dict[str, ApprovalCache] = {}
+
+
+def get_approval_cache(
+    network: str, web3: Web3, block_watcher: BlockWatcher
+) -> ApprovalCache:
+    """
+    Retrieves the shared approval cache of a network
+    Args:
+        network (str): Network name
+        web3 (Web3): Web3 instance of network
+        block_watcher (BlockWatcher): Chain head watcher of network
+
+    Returns (ApprovalCache): Approval cache
+
+    """
+    if network not in approval_caches:
+        approval_caches[network] = ApprovalCache(
+            network=network, web3=web3, block_watcher=block_watcher
+        )
+    return approval_caches[network]
@@ -1,110 +1,56 @@
+import time
 from decimal import Decimal
-from typing import Union
+from typing import Optional, Tuple, Union
 
-import aiohttp
-from aiogram.utils.markdown import link
 from cryptography.fernet import Fernet
-from pandas import DataFrame
 from web3 import Web3
-from web3.exceptions import ContractLogicError, BadFunctionCallOutput
+from web3.exceptions import BadFunctionCallOutput
 from web3.types import Wei, Address, ChecksumAddress
 
+from api.amm import InsufficientLiquidityError
 from api.eth import ERC20Like
+from api.rpc import get_web3, run_sync
 from app import logger
-from config import BSCSCAN_API_KEY, BUY, FERNET_KEY, HEADERS
+from config import (
+    BUY,
+    FERNET_KEY,
+    BINANCE_SMART_CHAIN_URLS,
+    BINANCE_SMART_CHAIN_WS_URL,
+)
 
 CONTRACT_ADDRESSES = {
     "BNB": Web3.toChecksumAddress("0x0000000000000000000000000000000000000000"),
     "WBNB": Web3.toChecksumAddress("0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"),
     "BUSD": Web3.toChecksumAddress("0xe9e7cea3dedca5984780bafc599bd69add087d56"),
 }
-BINANCE_SMART_CHAIN_URL = "https://bsc-dataseed.binance.org/"
+
+AVERAGE_TRANSACTION_SPEED = "average"
+
+SNIPE_GAS_LIMIT = 500000
+SNIPE_GAS_PRICE = Web3.toWei("65", "gwei")
+SNIPE_DEADLINE = 60 * 60 * 24
 
 
 class BinanceSmartChain(ERC20Like):
     def __init__(self):
         super(BinanceSmartChain, self).__init__()
-        self.web3 = Web3(
-            Web3.HTTPProvider(BINANCE_SMART_CHAIN_URL, request_kwargs={"timeout": 60})
-        )
+        self.network = "BSC"
+        self.network_name = "Binance Smart Chain"
+        self.native_symbol = "BNB"
+        self.ws_url = BINANCE_SMART_CHAIN_WS_URL
+        self.explorer_url = "https://bscscan.com"
+        self.swap_fee = 25
+        self.web3 = get_web3(network=self.network, urls=BINANCE_SMART_CHAIN_URLS)
         self.factory_address = self.web3.toChecksumAddress(
             "0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73"
         )
+        self.pair_init_code_hash = (
+            "0x00fb7f630766e6a796048ea87d01acd3068e8ff67d078148a3fa3f4a84f69bd5"
+        )
         self.router_address = self.web3.toChecksumAddress(
             "0x10ED43C718714eb63d5aA57B78B54704E256024E"
         )
 
-    async def get_account_token_holdings(
-        self, address: Union[Address, ChecksumAddress, str] = None
-    ) -> DataFrame:
-        """
-        Retrieves account holding for wallet address
-        Args:
-            address (AddressLike): Wallet address of user
-
-        Returns (dict): User account holdings
-
-        """
-        if not address:
-            address = self.address
-        logger.info("Gathering account holdings for %s", address)
-        account_holdings = []
-        holdings = {
-            "BNB": {
-                "address": self.web3.toChecksumAddress(CONTRACT_ADDRESSES["BNB"]),
-                "decimals": 18,
-            }
-        }
-        url = (
-            f"https://api.bscscan.com/api?module=account&action=tokentx&address={address}&sort=desc&"  # type: ignore
-            f"apikey={BSCSCAN_API_KEY}"
-        )
-
-        async with aiohttp.ClientSession() as session, session.get(
-            url, headers=HEADERS
-        ) as response:
-            data = await response.json()
-        bep20_transfers = data["result"]
-
-        for transfer in bep20_transfers:
-            holdings.update(
-                {
-                    transfer["tokenSymbol"]: {
-                        "address": self.web3.toChecksumAddress(
-                            transfer["contractAddress"]
-                        ),
-                        "decimals": int(transfer["tokenDecimal"]),
-                    }
-                }
-            )
-        for key, value in holdings.items():
-            coin = value
-            token = coin["address"]
-            token_decimals = coin["decimals"]
-
-            # Quantity in wei used to calculate price
-            quantity = await self.get_token_balance(address=self.address, token=token)
-
-            if quantity > 0:
-                try:
-                    token_price = await self.get_token_price(
-                        token=token, decimals=token_decimals
-                    )
-
-                    # Quantity in correct format as seen in wallet
-                    quantity = self.get_decimal_representation(
-                        quantity=quantity, decimals=coin["decimals"]
-                    )
-                    price = quantity * token_price
-                    usd_amount = price.quantize(Decimal("0.01"))
-                    account_holdings.append(
-                        {"Symbol": key, "Balance": quantity, "USD": usd_amount}
-                    )
-
-                except (ContractLogicError, BadFunctionCallOutput) as e:
-                    logger.exception(e)
-        return DataFrame(account_holdings)
-
     async def get_token_balance(
         self,
         address: Union[Address, ChecksumAddress, str],
@@ -121,14 +67,10 @@ class BinanceSmartChain(ERC20Like):
         """
         logger.info("Retrieving token balance for %s", address)
         if token == CONTRACT_ADDRESSES["BNB"]:
-            return self.web3.eth.get_balance(address)
-
-        abi = await self.get_contract_abi(abi_type="sell")
-        contract = self.web3.eth.contract(address=token, abi=abi)
-        return contract.functions.balanceOf(address).call()
+            return await self.get_native_balance(address=address)
 
-    async def get_token_price(self, token, decimals):
-        raise NotImplementedError
+        contract = self.get_contract(address=token, abi_type="sell")
+        return await run_sync(contract.functions.balanceOf(address).call)
 
 
 class PancakeSwap(BinanceSmartChain):
@@ -138,111 +80,165 @@ class PancakeSwap(BinanceSmartChain):
         self.key = key
         self.fernet = Fernet(FERNET_KEY)
 
-    async def swap_tokens(
+    async def broadcast_swap(
         self,
         token: str,
         amount_to_spend: Union[int, float, Decimal] = 0,
         side: str = BUY,
         is_snipe: bool = False,
+        chat_id: Optional[int] = None,
     ) -> str:
         """
-        Swaps crypto coins on PancakeSwap
+        Builds, signs & broadcasts swap on PancakeSwap. Errors are only raised before the swap is broadcast
         Args:
             token (str): Address of coin to buy/sell
             amount_to_spend (float): Amount in BNB expected to spend/receive. When selling will read as percentage
             side (str): Indicates if user wants to buy or sell coins
             is_snipe (bool): Indicates if swap is for sniping. Utilizes increasingly high gas price to ensure buying
                 token as soon as possible
+            chat_id (int): Telegram chat notified once swap is mined or fails
 
-        Returns: Reply to message
+        Returns (str): Swap transaction hash
 
         """
-        logger.info("Swapping tokens")
-        if self.web3.isConnected():
-            token = self.web3.toChecksumAddress(token)
-            wbnb = CONTRACT_ADDRESSES["WBNB"]
-            gas_price = (
-                self.web3.toWei("5", "gwei")
-                if not is_snipe
-                else self.web3.toWei("65", "gwei")
-            )
-            try:
-                txn = None
-                abi = await self.get_contract_abi(abi_type="router")
-                token_abi = await self.get_contract_abi(abi_type="sell")
-                contract = self.web3.eth.contract(address=self.router_address, abi=abi)
-                token_contract = self.web3.eth.contract(address=token, abi=token_abi)
-
-                if side == BUY:
-                    amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
-                    route = [wbnb, token]
-                    args = (contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_eth_for_tokens,
-                        self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = await self.get_token_balance(
-                        address=self.address, token=CONTRACT_ADDRESSES["BNB"]
-                    )
-                else:
-                    amount_to_spend = await self.get_token_balance(
-                        address=self.address, token=token  # type: ignore
-                    )
-                    route = [token, CONTRACT_ADDRESSES["WBNB"]]
-                    args = (contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_tokens_for_eth,
-                        self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
-                    await self._check_approval(
-                        contract=token_contract,
-                        token=token,
-                        balance=balance,
-                    )
-
-                if balance < amount_to_spend:
-                    raise ValueError(
-                        f"Insufficient balance. Had {balance}, needed {amount_to_spend}"
-                    )
-
-                for swap_method in swap_methods:
-                    try:
-                        txn = swap_method(*args)
-                        break
-                    except ContractLogicError as e:
-                        logger.exception(e)
-
-                signed_txn = self.web3.eth.account.sign_transaction(
-                    txn, private_key=self.fernet.decrypt(self.key.encode()).decode()
-                )
-                txn_hash = self.web3.toHex(
-                    self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                )
-                logger.info("Transaction completed successfully")
-                txn_hash_url = f"https://bscscan.com/tx/{txn_hash}"
-                reply = f"Transactions completed successfully. {link(title='View Transaction', url=txn_hash_url)}"
-
-                # Pre-approve token for future swaps
-                self.web3.eth.waitForTransactionReceipt(txn_hash, timeout=6000)
-                await self._check_approval(
-                    contract=token_contract,
-                    token=token,
-                    balance=self.get_token_balance(address=self.address, token=token),  # type: ignore
+        token = self.web3.toChecksumAddress(token)
+        wbnb = CONTRACT_ADDRESSES["WBNB"]
+        fees = (
+            await self.get_transaction_fees(speed=AVERAGE_TRANSACTION_SPEED)
+            if not is_snipe
+            else {"gasPrice": SNIPE_GAS_PRICE}
+        )
+        contract = self.get_contract(address=self.router_address, abi_type="router")
+        token_contract = self.get_contract(address=token, abi_type="sell")
+
+        if side == BUY:
+            needs_approval = False
+            amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
+            route = (
+                [wbnb, token]
+                if is_snipe
+                else await self.get_swap_route(
+                    amount_in=amount_to_spend, token_in=wbnb, token_out=token
                 )
-            except ValueError as e:
-                logger.exception(e)
-                reply = str(e)
+            )
+            args = (contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_eth_for_tokens,
+                self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(
+                address=self.address, token=CONTRACT_ADDRESSES["BNB"]
+            )
         else:
-            logger.info("Unable to connect to Binance Smart Chain")
-            reply = "⚠ Sorry, I was unable to connect to the Binance Smart Chain. Try again later."
-        return reply
+            amount_to_spend = await self.get_token_balance(
+                address=self.address, token=token  # type: ignore
+            )
+            route = await self.get_swap_route(
+                amount_in=amount_to_spend, token_in=token, token_out=wbnb
+            )
+            args = (contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_tokens_for_eth,
+                self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
+            needs_approval = await self._needs_approval(
+                contract=token_contract,
+                token=token,
+                balance=balance,
+            )
+
+        if balance < amount_to_spend:
+            raise ValueError(
+                f"Insufficient balance. Had {balance}, needed {amount_to_spend}"
+            )
+
+        txn_hash = await self._send_swap(
+            token=token,
+            side=side,
+            swap_methods=swap_methods,
+            args=args,
+            approve_contract=token_contract if needs_approval else None,
+        )
+        logger.info("Transaction completed successfully")
+        swap_receipt = self.track_transaction(
+            txn_hash=txn_hash, chat_id=chat_id, description="Swap"
+        )
 
-    async def get_token_price(
+        # Pre-approve token for future swaps once bought
+        if side == BUY:
+            self.pre_approve(contract=token_contract, swap_receipt=swap_receipt)
+        return txn_hash
+
+    async def prepare_snipe(
+        self, token: Union[Address, ChecksumAddress, str], amount_to_spend: Decimal
+    ) -> Tuple[bytes, int, int]:
+        """
+        Builds & signs snipe buy ahead of time with nonce & gas fixed, so it can be broadcast as soon as liquidity
+        is added. Gas can't be estimated before the token has liquidity, so a fixed gas limit is used. The nonce isn't
+        reserved, so the transaction goes stale once the wallet sends anything else & must be prepared again
+        Args:
+            token (AddressLike): Address of token to snipe
+            amount_to_spend (Decimal): Amount of BNB to spend
+
+        Returns (tuple): Signed raw transaction, its nonce & its deadline timestamp
+
+        """
+        logger.info("Preparing snipe transaction for %s", token)
+        await self.set_router_contract()
+        nonce = await self.get_nonce_manager().peek()
+        deadline = int(time.time()) + SNIPE_DEADLINE
+        txn = await run_sync(
+            self.router_contract.functions.swapExactETHForTokensSupportingFeeOnTransferTokens(
+                0, [CONTRACT_ADDRESSES["WBNB"], token], self.address, deadline
+            ).buildTransaction,
+            {
+                "from": self.address,
+                "value": self.web3.toWei(amount_to_spend, "ether"),
+                "gas": SNIPE_GAS_LIMIT,
+                "gasPrice": SNIPE_GAS_PRICE,
+                "nonce": nonce,
+            },
+        )
+        signed_txn = self.web3.eth.account.sign_transaction(
+            txn, private_key=self.get_private_key()
+        )
+        return signed_txn.rawTransaction, nonce, deadline
+
+    async def send_prepared_transaction(
+        self, raw_transaction: bytes, nonce: int, chat_id: Optional[int] = None
+    ) -> str:
+        """
+        Broadcasts signed transaction
+        Args:
+            raw_transaction (bytes): Signed raw transaction
+            nonce (int): Nonce transaction was signed with
+            chat_id (int): Telegram chat notified once transaction is mined or fails
+
+        Returns (str): Reply to message
+
+        """
+        nonce_manager = self.get_nonce_manager()
+
+        if not await nonce_manager.reserve_exact(nonce=nonce):
+            raise ValueError(f"Nonce {nonce} of prepared transaction was already used")
+        try:
+            txn_hash = self.web3.toHex(
+                await run_sync(self.web3.eth.send_raw_transaction, raw_transaction)
+            )
+        except Exception:
+            nonce_manager.resync(nonce=nonce)
+            raise
+        nonce_manager.sent(nonce=nonce)
+        logger.info("Broadcast prepared transaction %s", txn_hash)
+        self.track_transaction(txn_hash=txn_hash, chat_id=chat_id, description="Snipe")
+        return self.get_swap_reply(txn_hash=txn_hash)
+
+    async def quote_token_price(
         self, token: Union[Address, ChecksumAddress, str], decimals: int = 18
     ) -> Decimal:
         """
-        Gets token price in BUSD
+        Computes token price in BUSD
         Args:
             token (AddressLike): Contract Address of coin
             decimals (int): Token decimals
@@ -252,36 +248,17 @@ class PancakeSwap(BinanceSmartChain):
         """
         logger.info("Retrieving token price in BUSD for %s", token)
 
-        await self.set_router_contract()
         busd = CONTRACT_ADDRESSES["BUSD"]
         bnb = CONTRACT_ADDRESSES["BNB"]
         wbnb = CONTRACT_ADDRESSES["WBNB"]
 
-        route = [busd, wbnb, token] if token not in (bnb, wbnb) else [busd, bnb]
         qty = 10 ** decimals
 
         try:
-            token_price = self.web3.fromWei(
-                self.router_contract.functions.getAmountsIn(qty, route).call()[0],
-                "ether",
+            _, amounts = await self.get_best_amounts_in(
+                amount_out=qty, token_in=busd, token_out=wbnb if token == bnb else token
             )
-        except ContractLogicError:
+            token_price = self.web3.fromWei(amounts[0], "ether")
+        except (InsufficientLiquidityError, BadFunctionCallOutput):
             token_price = 0
         return token_price
-
-    async def get_token_pair_address(
-        self,
-        token_0: Union[Address, ChecksumAddress, str],
-        token_1: Union[Address, ChecksumAddress, str] = CONTRACT_ADDRESSES["WBNB"],
-    ) -> str:
-        """
-        Retrieves token pair address
-        Args:
-            token_0: BEP20 token address
-            token_1: BEP20 token address
-
-        Returns: Pair address
-
-        """
-        await self.set_factory_contract()
-        return self.factory_contract.functions.getPair(token_0, token_1).call()
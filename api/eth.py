@@ -1,23 +1,59 @@
+import asyncio
 import json
 import time
 from decimal import Decimal
-from typing import Union
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
-import aiofiles
-import aiohttp
 from aiogram.utils.markdown import link
 from cryptography.fernet import Fernet
+from eth_abi.exceptions import DecodingError
+from lru import LRU
 from pandas import DataFrame
-from pydantic.main import BaseModel
+from requests.exceptions import RequestException
 from web3 import Web3
-from web3.contract import Contract
+from web3._utils.abi import get_abi_output_types
+from web3.contract import Contract, ContractFunction
 from web3.exceptions import ContractLogicError, BadFunctionCallOutput
 from web3.types import Address, ChecksumAddress
 from web3.types import Wei, TxParams
 
+from api.amm import (
+    InsufficientLiquidityError,
+    compute_pair_address,
+    get_amount_in,
+    get_amount_out,
+    reserves_cache,
+    sort_tokens,
+)
+from api.approvals import (
+    MAX_APPROVAL,
+    MIN_CACHED_ALLOWANCE,
+    ApprovalCache,
+    get_approval_cache,
+)
+from api.nonce import NonceManager, get_nonce_manager
+from api.prices import token_price_cache
+from api.routing import (
+    BASE_TOKENS,
+    ReservesGraph,
+    best_route_in,
+    best_route_out,
+    candidate_routes,
+    route_pairs,
+)
+from api.rpc import batch_request, get_web3, run_sync
+from api.tokens import ERC20Token, token_cache
+from api.wallet_index import get_wallet_tokens
 from app import logger
-from config import FERNET_KEY, ETHEREUM_MAIN_NET_URL, BUY, ETHERSCAN_API_KEY
-from handlers import gas_tracker
+from config import (
+    FERNET_KEY,
+    ETHEREUM_MAIN_NET_URLS,
+    ETHEREUM_MAIN_NET_WS_URL,
+    BUY,
+)
+from services.block_watcher import BlockWatcher, get_block_watcher
+from services.gas_oracle import gas_oracle
+from services.receipts import RECEIPT_TIMEOUT, ReceiptTracker, get_receipt_tracker
 
 CONTRACT_ADDRESSES = {
     "ETH": Web3.toChecksumAddress("0x0000000000000000000000000000000000000000"),
@@ -25,42 +61,486 @@ CONTRACT_ADDRESSES = {
     "USDC": Web3.toChecksumAddress("0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"),
 }
 
+# Tokens of a wallet priced at the same time when valuing its holdings
+HOLDINGS_PRICING_CONCURRENCY = 10
+
+# Native ETH|BNB|MATIC balances are looked up under the zero address
+NATIVE_TOKEN_ADDRESS = Web3.toChecksumAddress(
+    "0x0000000000000000000000000000000000000000"
+)
+
 AVERAGE_TRANSACTION_SPEED = "fast"
 FAST_TRANSACTION_SPEED = "fastest"
 
+# Multicall3 is deployed at the same address on Ethereum, BSC & Polygon
+MULTICALL_ADDRESS = Web3.toChecksumAddress("0xcA11bde05977b3631167028862bE2a173976CA11")
+MULTICALL_CHUNK_SIZE = 200
+
+ABI_FILES = {
+    "liquidity": "abi/pancake_swap_liquidity_v2.abi",
+    "sell": "abi/sell.abi",
+    "router": "abi/pancakeswap_v2.abi",
+    "factory": "abi/factory_erc20.abi",
+    "multicall": "abi/multicall.abi",
+}
+CONTRACT_CACHE_SIZE = 1024
+
+
+def load_abis() -> Dict[str, list]:
+    """
+    Parses every contract abi file
+
+    Returns (dict): Parsed abi per abi type
+
+    """
+    abis = {}
+
+    for abi_type, filename in ABI_FILES.items():
+        with open(filename, mode="r") as file:
+            abis[abi_type] = json.load(file)
+    return abis
+
+
+ABIS = load_abis()
+
+# Contract objects per (network, address, abi type)
+contracts = LRU(CONTRACT_CACHE_SIZE)
+
+# Pair addresses per (factory, token0, token1), derived once
+pair_addresses: Dict[Tuple[str, str, str], str] = {}
+
+# Name of the swap builder that last succeeded per (network, token, side)
+swap_method_names: Dict[Tuple[str, str, str], str] = {}
 
-class ERC20Token(BaseModel):
-    name: str
-    symbol: str
-    decimals: int
-    network: str
-    address: Union[Address, ChecksumAddress, str]
+# Approvals being confirmed or sent in the background, referenced so they aren't garbage collected before completing
+approval_confirmations: Set[asyncio.Task] = set()
+
+# Gas limit of swaps sent right behind their approval, gas can't be estimated before the approval is mined
+PIPELINED_SWAP_GAS_LIMIT = 500000
+
+# Reply to a broadcast swap, followed by its explorer link. Swaps that aren't sent reply with the error instead
+SWAP_SUCCESS_REPLY = "Transactions completed successfully."
 
 
 class ERC20Like:
     def __init__(self):
         self.key = None
         self.fernet = None
+        self.network = None
+        self.network_name = None
+        self.native_symbol = None
+        self.ws_url = None
         self.web3 = None
         self.address = None
         self.router_address = None
         self.factory_address = None
+        self.pair_init_code_hash = None
         self.router_contract = None
         self.factory_contract = None
+        self.multicall_contract = None
+        self.explorer_url = None
+
+        # Swap fee in basis points
+        self.swap_fee = 30
 
     async def set_router_contract(self):
         if not self.router_contract:
-            self.router_contract = self.web3.eth.contract(
-                address=self.router_address,
-                abi=await self.get_contract_abi(abi_type="router"),
+            self.router_contract = self.get_contract(
+                address=self.router_address, abi_type="router"
             )
 
     async def set_factory_contract(self):
         if not self.factory_contract:
-            self.factory_contract = self.web3.eth.contract(
-                address=self.factory_address,
-                abi=await self.get_contract_abi(abi_type="factory"),
+            self.factory_contract = self.get_contract(
+                address=self.factory_address, abi_type="factory"
+            )
+
+    def get_contract(
+        self, address: Union[Address, ChecksumAddress, str], abi_type: str = "liquidity"
+    ) -> Contract:
+        """
+        Retrieves contract object, shared by every wrapper of this network
+        Args:
+            address (AddressLike): Contract address
+            abi_type (str): Type of abi to use
+
+        Returns (Contract): Contract
+
+        """
+        key = (self.network, address, abi_type)
+        contract = contracts.get(key)
+
+        if contract is None:
+            contract = self.web3.eth.contract(
+                address=address, abi=self.get_contract_abi(abi_type=abi_type)
+            )
+            contracts[key] = contract
+        return contract
+
+    def get_block_watcher(self) -> BlockWatcher:
+        """
+        Retrieves the shared chain head watcher for this network
+
+        Returns (BlockWatcher): Chain head watcher
+
+        """
+        return get_block_watcher(
+            network=self.network, web3=self.web3, ws_url=self.ws_url
+        )
+
+    async def set_multicall_contract(self):
+        if not self.multicall_contract:
+            self.multicall_contract = self.get_contract(
+                address=MULTICALL_ADDRESS, abi_type="multicall"
+            )
+
+    async def multicall(self, calls: List[ContractFunction]) -> List[Optional[Any]]:
+        """
+        Aggregates contract reads into a single eth_call per chunk of calls. Failing calls don't fail the batch
+        Args:
+            calls (list): Contract function calls to aggregate
+
+        Returns (list): Decoded result of each call. None for failed calls
+
+        """
+        await self.set_multicall_contract()
+        chunks = [
+            calls[index : index + MULTICALL_CHUNK_SIZE]
+            for index in range(0, len(calls), MULTICALL_CHUNK_SIZE)
+        ]
+        aggregates = [
+            self.multicall_contract.functions.tryAggregate(
+                False,
+                [(call.address, call._encode_transaction_data()) for call in chunk],
+            )
+            for chunk in chunks
+        ]
+        # Sent as raw eth_calls so chunks & multicalls of concurrent callers share one JSON-RPC batch
+        outputs = await asyncio.gather(
+            *(
+                self.rpc_request(
+                    method="eth_call",
+                    params=[
+                        {
+                            "to": MULTICALL_ADDRESS,
+                            "data": aggregate._encode_transaction_data(),
+                        },
+                        "latest",
+                    ],
+                )
+                for aggregate in aggregates
+            )
+        )
+        results: List[Optional[Any]] = []
+
+        for chunk, aggregate, output in zip(chunks, aggregates, outputs):
+            (return_data,) = self.web3.codec.decode_abi(
+                get_abi_output_types(aggregate.abi), self.web3.toBytes(hexstr=output)
+            )
+            results.extend(
+                self._decode_call_result(call=call, success=success, data=data)
+                for call, (success, data) in zip(chunk, return_data)
+            )
+        return results
+
+    def _decode_call_result(
+        self, call: ContractFunction, success: bool, data: bytes
+    ) -> Optional[Any]:
+        if not success or not data:
+            return None
+        try:
+            result = self.web3.codec.decode_abi(get_abi_output_types(call.abi), data)
+        except DecodingError:
+            return None
+        return result[0] if len(result) == 1 else list(result)
+
+    async def get_token_balances(
+        self,
+        address: Union[Address, ChecksumAddress, str],
+        tokens: List[Union[Address, ChecksumAddress, str]],
+    ) -> List[Wei]:
+        """
+        Retrieves balances of many tokens in a single multicall. Zero address is read as the native coin
+        Args:
+            address (AddressLike): Wallet address
+            tokens (list): Token contract addresses
+
+        Returns (list): Token balances in wallet. Zero for tokens that failed to report a balance
+
+        """
+        logger.info("Retrieving %d token balances for %s", len(tokens), address)
+        await self.set_multicall_contract()
+        calls = [
+            self.multicall_contract.functions.getEthBalance(address)
+            if int(token, 16) == 0
+            else self.get_contract(address=token, abi_type="sell").functions.balanceOf(
+                address
+            )
+            for token in tokens
+        ]
+        return [balance or 0 for balance in await self.multicall(calls)]
+
+    def get_approval_cache(self) -> ApprovalCache:
+        """
+        Retrieves the shared token approval cache for this network
+
+        Returns (ApprovalCache): Approval cache
+
+        """
+        return get_approval_cache(
+            network=self.network, web3=self.web3, block_watcher=self.get_block_watcher()
+        )
+
+    def _forget_approval(self, token: str) -> None:
+        """
+        Drops cached approval of token so its allowance is re-checked on next swap, e.g. after a swap failed because
+        the approval was revoked
+        Args:
+            token (str): Token contract address
+
+        """
+        self.get_approval_cache().clear(
+            wallet=self.address, token=token, router=self.router_address
+        )
+
+    def get_receipt_tracker(self) -> ReceiptTracker:
+        """
+        Retrieves the shared transaction receipt tracker for this network
+
+        Returns (ReceiptTracker): Receipt tracker
+
+        """
+        return get_receipt_tracker(
+            network=self.network,
+            web3=self.web3,
+            block_watcher=self.get_block_watcher(),
+            explorer_url=self.explorer_url,
+        )
+
+    def track_transaction(
+        self,
+        txn_hash: str,
+        chat_id: Optional[int] = None,
+        description: str = "Transaction",
+        timeout: float = RECEIPT_TIMEOUT,
+    ) -> asyncio.Future:
+        """
+        Tracks transaction until it is mined
+        Args:
+            txn_hash (str): Transaction hash
+            chat_id (int): Telegram chat to notify once transaction is mined or fails
+            description (str): Transaction description used in follow-up message
+            timeout (float): Seconds to wait for transaction to be mined
+
+        Returns (asyncio.Future): Resolves to raw transaction receipt
+
+        """
+        return self.get_receipt_tracker().track(
+            txn_hash=txn_hash, chat_id=chat_id, description=description, timeout=timeout
+        )
+
+    async def rpc_request(self, method: str, params: list) -> Any:
+        """
+        Sends JSON-RPC request, batched with every other request issued in the same event loop iteration
+        Args:
+            method (str): JSON-RPC method
+            params (list): JSON-RPC params
+
+        Returns (Any): Raw result of request
+
+        """
+        return await batch_request(web3=self.web3, method=method, params=params)
+
+    async def get_native_balance(
+        self, address: Union[Address, ChecksumAddress, str]
+    ) -> Wei:
+        """
+        Retrieves native coin balance of address
+        Args:
+            address (AddressLike): Wallet address
+
+        Returns (Wei): Native coin balance
+
+        """
+        balance = await self.rpc_request(
+            method="eth_getBalance", params=[address, "latest"]
+        )
+        return Wei(int(balance, 16))
+
+    async def get_transaction_fees(self, speed: str) -> dict:
+        """
+        Retrieves gas fee fields for a transaction from the gas oracle
+        Args:
+            speed (str): Transaction speed. One of slow, average, fast or fastest
+
+        Returns (dict): Transaction fee fields
+
+        """
+        gas_prices = await gas_oracle.get_gas_prices(network=self.network)
+        return gas_prices.transaction_fees(speed=speed)
+
+    def get_nonce_manager(self) -> NonceManager:
+        """
+        Retrieves the nonce manager of the wallet on this network
+
+        Returns (NonceManager): Wallet nonce manager
+
+        """
+        return get_nonce_manager(
+            network=self.network, web3=self.web3, address=self.address
+        )
+
+    async def _build_swap(
+        self, token: str, side: str, swap_methods: list, args: tuple, nonce: int
+    ) -> Optional[TxParams]:
+        """
+        Builds swap transaction. The method that worked last time for token is tried alone, otherwise every method
+        is estimated concurrently & the first one in order of preference that succeeds is remembered for token
+        Args:
+            token (str): Token being swapped
+            side (str): Swap side
+            swap_methods (list): Swap transaction builders in order of preference
+            args (tuple): Swap builder arguments, without nonce
+            nonce (int): Reserved transaction nonce
+
+        Returns (Optional[TxParams]): Transaction to be signed. None if no method succeeds
+
+        """
+        key = (self.network, token, side)
+        method_name = swap_method_names.get(key)
+
+        for swap_method in swap_methods:
+            if swap_method.__name__ == method_name:
+                try:
+                    return await run_sync(swap_method, *args, nonce)
+                except ContractLogicError as e:
+                    # Token behaviour changed, e.g. transfer fees were switched on
+                    logger.exception(e)
+                    swap_method_names.pop(key, None)
+
+        results = await asyncio.gather(
+            *(run_sync(swap_method, *args, nonce) for swap_method in swap_methods),
+            return_exceptions=True,
+        )
+
+        for swap_method, result in zip(swap_methods, results):
+            if isinstance(result, ContractLogicError):
+                logger.exception(result)
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                swap_method_names[key] = swap_method.__name__
+                return result
+        return None
+
+    async def _build_pipelined_swap(
+        self, token: str, side: str, swap_methods: list, args: tuple, nonce: int
+    ) -> TxParams:
+        """
+        Builds swap sent in the same block as its approval. Estimation would revert without the allowance, so the
+        method remembered for token is built with a fixed gas limit, falling back to the last method which supports
+        fee on transfer tokens & therefore every token
+        Args:
+            token (str): Token being swapped
+            side (str): Swap side
+            swap_methods (list): Swap transaction builders in order of preference
+            args (tuple): Swap builder arguments, without nonce. Gas fee fields come last
+            nonce (int): Reserved transaction nonce
+
+        Returns (TxParams): Transaction to be signed
+
+        """
+        method_name = swap_method_names.get((self.network, token, side))
+        swap_method = next(
+            (method for method in swap_methods if method.__name__ == method_name),
+            swap_methods[-1],
+        )
+        *swap_args, fees = args
+        return await run_sync(
+            swap_method, *swap_args, {**fees, "gas": PIPELINED_SWAP_GAS_LIMIT}, nonce
+        )
+
+    async def _send_swap(
+        self,
+        token: str,
+        side: str,
+        swap_methods: list,
+        args: tuple,
+        approve_contract: Optional[Contract] = None,
+    ) -> str:
+        """
+        Builds swap with the first method that succeeds, then signs & broadcasts it with a locally reserved nonce.
+        When token still needs approval, the approval is broadcast first & the swap follows with the next nonce
+        without waiting for the approval to be mined
+        Args:
+            token (str): Token being swapped
+            side (str): Swap side
+            swap_methods (list): Swap transaction builders in order of preference
+            args (tuple): Swap builder arguments, without nonce
+            approve_contract (Contract): Token contract to approve before swapping
+
+        Returns (str): Transaction hash
+
+        """
+        if approve_contract is not None:
+            approval_hash = await self._send_approval(contract=approve_contract)
+            task = asyncio.create_task(
+                self._confirm_approval(
+                    contract=approve_contract, txn_hash=approval_hash
+                )
             )
+            approval_confirmations.add(task)
+            task.add_done_callback(approval_confirmations.discard)
+        nonce_manager = self.get_nonce_manager()
+        nonce = await nonce_manager.reserve()
+        try:
+            if approve_contract is None:
+                txn = await self._build_swap(
+                    token=token,
+                    side=side,
+                    swap_methods=swap_methods,
+                    args=args,
+                    nonce=nonce,
+                )
+            else:
+                txn = await self._build_pipelined_swap(
+                    token=token,
+                    side=side,
+                    swap_methods=swap_methods,
+                    args=args,
+                    nonce=nonce,
+                )
+        except Exception:
+            nonce_manager.release(nonce=nonce)
+            raise
+
+        if txn is None:
+            nonce_manager.release(nonce=nonce)
+            raise ValueError("Unable to build swap transaction")
+        signed_txn = self.web3.eth.account.sign_transaction(
+            txn, private_key=self.get_private_key()
+        )
+        try:
+            txn_hash = self.web3.toHex(
+                await run_sync(
+                    self.web3.eth.send_raw_transaction, signed_txn.rawTransaction
+                )
+            )
+        except Exception:
+            # Node may or may not have accepted the transaction
+            nonce_manager.resync(nonce=nonce)
+            raise
+        nonce_manager.sent(nonce=nonce)
+        return txn_hash
+
+    def get_private_key(self) -> str:
+        """
+        Decrypts wallet private key. Key is decrypted for every signature rather than kept in memory as plaintext
+
+        Returns (str): Private key
+
+        """
+        return self.fernet.decrypt(self.key.encode()).decode()
 
     @staticmethod
     def get_decimal_representation(quantity: Wei, decimals: int) -> Decimal:
@@ -77,31 +557,24 @@ class ERC20Like:
         return quantity / Decimal(10 ** (18 - (decimals % 18)))
 
     @staticmethod
-    async def get_contract_abi(abi_type: str = "liquidity") -> str:
+    def get_contract_abi(abi_type: str = "liquidity") -> list:
         """
-        Retrieves contract abi
+        Retrieves contract abi, parsed once at import
         Args:
             abi_type (str): Type of abi to use
 
-        Returns (str): Abi string
+        Returns (list): Abi
 
         """
-        logger.info("Retrieving contract abi for type: %s", abi_type)
-        filename = "abi/pancake_swap_liquidity_v2.abi"
-
-        if abi_type == "sell":
-            filename = "abi/sell.abi"
-        elif abi_type == "router":
-            filename = "abi/pancakeswap_v2.abi"
-        elif abi_type == "factory":
-            filename = "abi/factory_erc20.abi"
-        async with aiofiles.open(filename, mode="r") as file:
-            data = await file.read()
-            abi = json.loads(data)
-        return abi
+        return ABIS.get(abi_type, ABIS["liquidity"])
 
     def _swap_exact_eth_for_tokens(
-        self, contract: Contract, route: list, amount_to_spend: Wei, gas_price: Wei
+        self,
+        contract: Contract,
+        route: list,
+        amount_to_spend: Wei,
+        fees: dict,
+        nonce: int,
     ) -> TxParams:
         """
         Swaps exact ETH|BNB|MATIC for tokens.
@@ -109,7 +582,8 @@ class ERC20Like:
             contract (Contract): Token contract for swapping
             route (list): Token route to take for swap
             amount_to_spend (Wei): Amount to spend on swap
-            gas_price (Wei): gas price to use
+            fees (dict): Gas fee fields of transaction
+            nonce (int): Reserved transaction nonce
 
         Returns (TxParams): Transaction to be signed
 
@@ -121,13 +595,18 @@ class ERC20Like:
             {
                 "from": self.address,
                 "value": amount_to_spend,
-                "gasPrice": gas_price,
-                "nonce": self.web3.eth.get_transaction_count(self.address),
+                "nonce": nonce,
+                **fees,
             }
         )
 
     def _swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens(
-        self, contract: Contract, route: list, amount_to_spend: Wei, gas_price: Wei
+        self,
+        contract: Contract,
+        route: list,
+        amount_to_spend: Wei,
+        fees: dict,
+        nonce: int,
     ) -> TxParams:
         """
         Swaps exact ETH|BNB|MATIC for tokens supporting fee on transfer tokens
@@ -135,7 +614,8 @@ class ERC20Like:
             contract (Contract): Token contract for swapping
             route (list): Token route to take for swap
             amount_to_spend (Wei): Amount to spend on swap
-            gas_price (Wei): gas price to use
+            fees (dict): Gas fee fields of transaction
+            nonce (int): Reserved transaction nonce
 
         Returns (TxParams): Transaction to be signed
 
@@ -147,13 +627,18 @@ class ERC20Like:
             {
                 "from": self.address,
                 "value": amount_to_spend,
-                "gasPrice": gas_price,
-                "nonce": self.web3.eth.get_transaction_count(self.address),
+                "nonce": nonce,
+                **fees,
             }
         )
 
     def _swap_exact_tokens_for_eth(
-        self, contract: Contract, route: list, amount_to_spend: Wei, gas_price: Wei
+        self,
+        contract: Contract,
+        route: list,
+        amount_to_spend: Wei,
+        fees: dict,
+        nonce: int,
     ) -> TxParams:
         """
         Swaps exact tokens for ETH|BNB|MATIC
@@ -161,7 +646,8 @@ class ERC20Like:
             contract (Contract): Token contract for swapping
             route (list): Token route to take for swap
             amount_to_spend (Wei): Amount to spend on swap
-            gas_price (Wei): gas price to use
+            fees (dict): Gas fee fields of transaction
+            nonce (int): Reserved transaction nonce
 
         Returns (TxParams): Transaction to be signed
 
@@ -176,13 +662,18 @@ class ERC20Like:
         ).buildTransaction(
             {
                 "from": self.address,
-                "gasPrice": gas_price,
-                "nonce": self.web3.eth.get_transaction_count(self.address),
+                "nonce": nonce,
+                **fees,
             }
         )
 
     def _swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens(
-        self, contract: Contract, route: list, amount_to_spend: Wei, gas_price: Wei
+        self,
+        contract: Contract,
+        route: list,
+        amount_to_spend: Wei,
+        fees: dict,
+        nonce: int,
     ) -> TxParams:
         """
         Swaps exact tokens for ETH|BNB|MATIC supporting fee on transfer tokens
@@ -190,7 +681,8 @@ class ERC20Like:
             contract (Contract): Token contract for swapping
             route (list): Token route to take for swap
             amount_to_spend (Wei): Amount to spend on swap
-            gas_price (Wei): gas price to use
+            fees (dict): Gas fee fields of transaction
+            nonce (int): Reserved transaction nonce
 
         Returns (TxParams): Transaction to be signed
 
@@ -205,68 +697,554 @@ class ERC20Like:
         ).buildTransaction(
             {
                 "from": self.address,
-                "gasPrice": gas_price,
-                "nonce": self.web3.eth.get_transaction_count(self.address),
+                "nonce": nonce,
+                **fees,
             }
         )
 
-    def _approve(self, contract: Contract) -> None:
+    async def _send_approval(self, contract: Contract) -> str:
         """
-        Approves token for spending
+        Signs & broadcasts token approval with a locally reserved nonce
         Args:
             contract (Contract): Token contract
 
+        Returns (str): Transaction hash
+
         """
         logger.info("Approving token for swap")
-        max_approval = int(
-            "0x000000000000000fffffffffffffffffffffffffffffffffffffffffffffffff",
-            16,
-        )
-        approve = contract.functions.approve(
-            self.router_address, max_approval
-        ).buildTransaction(
-            {
-                "from": self.address,
-                "gasPrice": self.web3.toWei("5", "gwei"),
-                "nonce": self.web3.eth.get_transaction_count(self.address),
-            }
-        )
+        self._forget_approval(token=contract.address)
+        fees = await self.get_transaction_fees(speed=AVERAGE_TRANSACTION_SPEED)
+        nonce_manager = self.get_nonce_manager()
+        nonce = await nonce_manager.reserve()
+        try:
+            approve = await run_sync(
+                contract.functions.approve(
+                    self.router_address, MAX_APPROVAL
+                ).buildTransaction,
+                {
+                    "from": self.address,
+                    "nonce": nonce,
+                    **fees,
+                },
+            )
+        except Exception:
+            nonce_manager.release(nonce=nonce)
+            raise
         signed_txn = self.web3.eth.account.sign_transaction(
             approve,
-            private_key=self.fernet.decrypt(self.key.encode()).decode(),
+            private_key=self.get_private_key(),
+        )
+        try:
+            txn_hash = self.web3.toHex(
+                await run_sync(
+                    self.web3.eth.send_raw_transaction, signed_txn.rawTransaction
+                )
+            )
+        except Exception:
+            # Node may or may not have accepted the transaction
+            nonce_manager.resync(nonce=nonce)
+            raise
+        nonce_manager.sent(nonce=nonce)
+        return txn_hash
+
+    async def _confirm_approval(self, contract: Contract, txn_hash: str) -> None:
+        """
+        Waits for token approval to be mined & caches it once it succeeds
+        Args:
+            contract (Contract): Token contract
+            txn_hash (str): Approval transaction hash
+
+        """
+        try:
+            receipt = await self.track_transaction(
+                txn_hash=txn_hash, description="Token approval"
+            )
+        except (RequestException, ValueError) as e:
+            logger.exception(e)
+            return
+
+        if int(receipt["status"], 16) != 1:
+            # Allowance is re-checked on next swap, which sends a new approval
+            logger.warning("Token approval %s failed", txn_hash)
+            return
+        self.get_approval_cache().add(
+            wallet=self.address, token=contract.address, router=self.router_address
         )
-        txn = self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        self.web3.eth.wait_for_transaction_receipt(txn, timeout=6000)
-        time.sleep(1)
         logger.info("Approved token for swap")
 
-    async def _check_approval(
-        self, contract: Contract, token: Union[Address, ChecksumAddress, str], balance: Wei = 0  # type: ignore
+    async def _pre_approve(
+        self, contract: Contract, swap_receipt: asyncio.Future
     ) -> None:
         """
-        Validates token is approved for swapping. If not, approves token for swapping.
+        Waits for buy to be mined, then approves bought token so selling it later doesn't wait on an approval
+        Args:
+            contract (Contract): Bought token contract
+            swap_receipt (asyncio.Future): Receipt of buy being tracked
+
+        """
+        try:
+            receipt = await swap_receipt
+
+            if int(receipt["status"], 16) != 1:
+                return
+            await self._check_approval(contract=contract, token=contract.address)
+        except Exception as e:
+            logger.exception(e)
+            self._forget_approval(token=contract.address)
+
+    def pre_approve(self, contract: Contract, swap_receipt: asyncio.Future) -> None:
+        """
+        Approves bought token in the background once its buy is mined, never delaying the swap reply
+        Args:
+            contract (Contract): Bought token contract
+            swap_receipt (asyncio.Future): Receipt of buy being tracked
+
+        """
+        task = asyncio.create_task(
+            self._pre_approve(contract=contract, swap_receipt=swap_receipt)
+        )
+        approval_confirmations.add(task)
+        task.add_done_callback(approval_confirmations.discard)
+
+    async def _approve(self, contract: Contract) -> None:
+        """
+        Approves token for spending & waits for approval to be mined
+        Args:
+            contract (Contract): Token contract
+
+        """
+        txn_hash = await self._send_approval(contract=contract)
+        receipt = await self.track_transaction(
+            txn_hash=txn_hash, description="Token approval"
+        )
+
+        if int(receipt["status"], 16) != 1:
+            raise ValueError(f"Token approval {txn_hash} failed")
+        self.get_approval_cache().add(
+            wallet=self.address, token=contract.address, router=self.router_address
+        )
+        logger.info("Approved token for swap")
+
+    async def _needs_approval(
+        self, contract: Contract, token: Union[Address, ChecksumAddress, str], balance: Wei = 0  # type: ignore
+    ) -> bool:
+        """
+        Validates token is approved for swapping. Sufficient allowances are cached
         Args:
             contract (Contract): Token Contract
             token (AddressLike): Token to check approval
             balance (Wei): Token balance
 
+        Returns (bool): Token needs approval before swapping
+
         """
+        approval_cache = self.get_approval_cache()
+
+        if approval_cache.is_approved(
+            wallet=self.address, token=token, router=self.router_address
+        ):
+            return False
         logger.info("Verifying token (%s) has approval", token)
-        balance = (
-            await self.get_token_balance(address=self.address, token=token)
-            if balance == 0
-            else balance
-        )
-        allowance = contract.functions.allowance(
-            self.address, self.router_address
-        ).call()
+        calls = [contract.functions.allowance(self.address, self.router_address)]
+
+        if balance == 0:
+            calls.append(contract.functions.balanceOf(self.address))
+        allowance, *balances = await self.multicall(calls)
+        balance = (balances[0] or 0) if balances else balance
+        allowance = allowance or 0
 
         if balance > allowance:
-            self._approve(contract=contract)
+            return True
+
+        if allowance >= MIN_CACHED_ALLOWANCE:
+            approval_cache.add(
+                wallet=self.address, token=token, router=self.router_address
+            )
+        return False
+
+    async def _check_approval(
+        self, contract: Contract, token: Union[Address, ChecksumAddress, str], balance: Wei = 0  # type: ignore
+    ) -> None:
+        """
+        Validates token is approved for swapping. If not, approves token for swapping.
+        Args:
+            contract (Contract): Token Contract
+            token (AddressLike): Token to check approval
+            balance (Wei): Token balance
+
+        """
+        if await self._needs_approval(contract=contract, token=token, balance=balance):
+            await self._approve(contract=contract)
 
     async def get_token_balance(self, address, token):
         raise NotImplementedError
 
+    async def broadcast_swap(
+        self,
+        token: str,
+        amount_to_spend: Union[int, float, Decimal] = 0,
+        side: str = BUY,
+        is_snipe: bool = False,
+        chat_id: Optional[int] = None,
+    ) -> str:
+        raise NotImplementedError
+
+    def get_swap_reply(self, txn_hash: str) -> str:
+        """
+        Builds reply to a broadcast swap
+        Args:
+            txn_hash (str): Swap transaction hash
+
+        Returns (str): Reply to message
+
+        """
+        txn_hash_url = f"{self.explorer_url}/tx/{txn_hash}"
+        return (
+            f"{SWAP_SUCCESS_REPLY} {link(title='View Transaction', url=txn_hash_url)}"
+        )
+
+    async def swap_tokens(
+        self,
+        token: str,
+        amount_to_spend: Union[int, float, Decimal] = 0,
+        side: str = BUY,
+        is_snipe: bool = False,
+        chat_id: Optional[int] = None,
+    ) -> str:
+        """
+        Swaps crypto coins, replying with the swap transaction or with the reason it wasn't broadcast
+        Args:
+            token (str): Address of coin to buy/sell
+            amount_to_spend (float): Amount of native coin expected to spend/receive. When selling will read as
+                percentage
+            side (str): Indicates if user wants to buy or sell coins
+            is_snipe (bool): Indicates if swap is for sniping. Utilizes increasingly high gas price to ensure buying
+                token as soon as possible
+            chat_id (int): Telegram chat notified once swap is mined or fails
+
+        Returns: Reply to message
+
+        """
+        logger.info("Swapping tokens")
+        if not await run_sync(self.web3.isConnected):
+            logger.info("Unable to connect to %s", self.network_name)
+            return f"⚠ Sorry, I was unable to connect to the {self.network_name}. Try again later."
+
+        token = self.web3.toChecksumAddress(token)
+        try:
+            txn_hash = await self.broadcast_swap(
+                token=token,
+                amount_to_spend=amount_to_spend,
+                side=side,
+                is_snipe=is_snipe,
+                chat_id=chat_id,
+            )
+        except (RequestException, ValueError) as e:
+            logger.exception(e)
+            self._forget_approval(token=token)
+            return str(e)
+        return self.get_swap_reply(txn_hash=txn_hash)
+
+    def get_token_pair_address(
+        self,
+        token_0: Union[Address, ChecksumAddress, str],
+        token_1: Union[Address, ChecksumAddress, str],
+    ) -> str:
+        """
+        Derives token pair address locally from the factory address & pair init code hash
+        Args:
+            token_0 (AddressLike): Token address
+            token_1 (AddressLike): Token address
+
+        Returns (str): Pair address. The pair may not exist yet, in which case its reserves can't be read
+
+        """
+        token_0, token_1 = sort_tokens(
+            Web3.toChecksumAddress(token_0), Web3.toChecksumAddress(token_1)
+        )
+        key = (self.factory_address, token_0, token_1)
+
+        if key not in pair_addresses:
+            pair_addresses[key] = compute_pair_address(  # type: ignore
+                factory=self.factory_address,
+                token_a=token_0,
+                token_b=token_1,
+                init_code_hash=self.pair_init_code_hash,
+            )
+        return pair_addresses[key]  # type: ignore
+
+    async def get_pairs_reserves(
+        self, pairs: List[str]
+    ) -> Dict[str, Optional[Tuple[int, int]]]:
+        """
+        Retrieves reserves of pairs. Pairs not fetched during the current block are refreshed in a single multicall
+        Args:
+            pairs (list): Pair addresses
+
+        Returns (dict): Reserves of token0 & token1 per pair. None if reserves can't be read
+
+        """
+        block_number = await self.get_block_watcher().current_block_number()
+        stale_pairs = [
+            pair
+            for pair in set(pairs)
+            if not reserves_cache.has(
+                network=self.network, pair=pair, block_number=block_number
+            )
+        ]
+
+        if stale_pairs:
+            calls = [
+                self.get_contract(
+                    address=pair, abi_type="liquidity"
+                ).functions.getReserves()
+                for pair in stale_pairs
+            ]
+
+            for pair, reserves in zip(stale_pairs, await self.multicall(calls)):
+                reserves_cache.set(
+                    network=self.network,
+                    pair=pair,
+                    reserves=(reserves[0], reserves[1]) if reserves else None,
+                    block_number=block_number,
+                )
+        return {
+            pair: reserves_cache.get(
+                network=self.network, pair=pair, block_number=block_number
+            )
+            for pair in pairs
+        }
+
+    async def get_route_reserves(self, route: list) -> List[Tuple[int, int]]:
+        """
+        Retrieves reserves of every pair along route
+        Args:
+            route (list): Token route
+
+        Returns (list): Reserves of input & output token for every hop
+
+        """
+        hops = list(zip(route, route[1:]))
+        pairs = [
+            self.get_token_pair_address(token_0=token_in, token_1=token_out)
+            for token_in, token_out in hops
+        ]
+        pairs_reserves = await self.get_pairs_reserves(pairs=pairs)
+
+        route_reserves = []
+        for (token_in, token_out), pair in zip(hops, pairs):
+            if pairs_reserves[pair] is None:
+                raise InsufficientLiquidityError(
+                    f"Pair {token_in}/{token_out} does not exist"
+                )
+            reserve_0, reserve_1 = pairs_reserves[pair]  # type: ignore
+            token_0, _ = sort_tokens(token_in, token_out)
+            route_reserves.append(
+                (reserve_0, reserve_1)
+                if token_in == token_0
+                else (reserve_1, reserve_0)
+            )
+        return route_reserves
+
+    async def get_amounts_out(self, amount_in: int, route: list) -> List[int]:
+        """
+        Computes swap output amounts along route locally from cached pair reserves
+        Args:
+            amount_in (int): Input amount in wei
+            route (list): Token route
+
+        Returns (list): Amounts for every token in route
+
+        """
+        amounts = [amount_in]
+
+        for reserve_in, reserve_out in await self.get_route_reserves(route=route):
+            amounts.append(
+                get_amount_out(amounts[-1], reserve_in, reserve_out, self.swap_fee)
+            )
+        return amounts
+
+    async def get_amounts_in(self, amount_out: int, route: list) -> List[int]:
+        """
+        Computes swap input amounts along route locally from cached pair reserves
+        Args:
+            amount_out (int): Output amount in wei
+            route (list): Token route
+
+        Returns (list): Amounts for every token in route
+
+        """
+        amounts = [amount_out]
+
+        for reserve_in, reserve_out in reversed(
+            await self.get_route_reserves(route=route)
+        ):
+            amounts.insert(
+                0, get_amount_in(amounts[0], reserve_in, reserve_out, self.swap_fee)
+            )
+        return amounts
+
+    async def get_tokens(
+        self, addresses: List[Union[Address, ChecksumAddress, str]]
+    ) -> Dict[str, ERC20Token]:
+        """
+        Retrieves metadata of several tokens. Metadata of uncached tokens is fetched in a single multicall
+        Args:
+            addresses (list): Contract addresses of tokens
+
+        Returns (dict): Token per checksum address. Addresses that aren't token contracts are left out
+
+        """
+        tokens = {}
+        missing = []
+
+        for address in dict.fromkeys(map(Web3.toChecksumAddress, addresses)):
+            token = token_cache.get(network=self.network, address=address)
+
+            if token:
+                tokens[address] = token
+            else:
+                missing.append(address)
+
+        if not missing:
+            return tokens
+        logger.info("Retrieving metadata for %d tokens", len(missing))
+        calls = []
+
+        for address in missing:
+            token_contract = self.get_contract(address=address, abi_type="sell")
+            calls += [
+                token_contract.functions.name(),
+                token_contract.functions.symbol(),
+                token_contract.functions.decimals(),
+            ]
+        results = await self.multicall(calls)
+        new_tokens = []
+
+        for index, address in enumerate(missing):
+            name, symbol, decimals = results[3 * index : 3 * index + 3]
+
+            if decimals is None:
+                logger.warning("%s is not a token contract", address)
+                continue
+            tokens[address] = ERC20Token(
+                name=name or "",
+                symbol=symbol or "",
+                decimals=decimals,
+                network=self.network,
+                address=address,
+            )
+            new_tokens.append(tokens[address])
+        token_cache.add_many(tokens=new_tokens)
+        return tokens
+
+    async def get_reserves_graph(
+        self, token_pairs: List[Tuple[str, str]]
+    ) -> ReservesGraph:
+        """
+        Builds graph of pair reserves. Reserves come from the per block reserves cache, so the graph costs at most
+        one multicall per block
+        Args:
+            token_pairs (list): Token pairs, sorted like token0 & token1 of each pair
+
+        Returns (ReservesGraph): Reserves of every existing pair
+
+        """
+        pairs = [
+            (tokens, self.get_token_pair_address(token_0=tokens[0], token_1=tokens[1]))
+            for tokens in token_pairs
+        ]
+        pairs_reserves = await self.get_pairs_reserves(
+            pairs=[pair for _, pair in pairs]
+        )
+        graph = ReservesGraph()
+
+        # Reserves of pairs that were never created can't be read, so those pairs are left out
+        for (token_0, token_1), pair in pairs:
+            reserves = pairs_reserves[pair]
+
+            if reserves is not None:
+                graph.add_pair(token_0, token_1, *reserves)
+        return graph
+
+    async def get_best_amounts_out(
+        self, amount_in: int, token_in: str, token_out: str
+    ) -> Tuple[List[str], List[int]]:
+        """
+        Finds the 1 to 3 hop route through base tokens yielding the highest output for an exact input amount
+        Args:
+            amount_in (int): Input amount in wei
+            token_in (str): Input token address
+            token_out (str): Output token address
+
+        Returns (tuple): Best route & amounts for every token in route
+
+        """
+        token_in = Web3.toChecksumAddress(token_in)
+        token_out = Web3.toChecksumAddress(token_out)
+
+        if token_in == token_out:
+            return [token_in], [amount_in]
+        routes = candidate_routes(
+            token_in=token_in,
+            token_out=token_out,
+            base_tokens=BASE_TOKENS[self.network],
+        )
+        graph = await self.get_reserves_graph(token_pairs=route_pairs(routes=routes))
+        return best_route_out(
+            graph=graph, amount_in=amount_in, routes=routes, fee=self.swap_fee
+        )
+
+    async def get_best_amounts_in(
+        self, amount_out: int, token_in: str, token_out: str
+    ) -> Tuple[List[str], List[int]]:
+        """
+        Finds the 1 to 3 hop route through base tokens requiring the lowest input for an exact output amount
+        Args:
+            amount_out (int): Output amount in wei
+            token_in (str): Input token address
+            token_out (str): Output token address
+
+        Returns (tuple): Best route & amounts for every token in route
+
+        """
+        token_in = Web3.toChecksumAddress(token_in)
+        token_out = Web3.toChecksumAddress(token_out)
+
+        if token_in == token_out:
+            return [token_in], [amount_out]
+        routes = candidate_routes(
+            token_in=token_in,
+            token_out=token_out,
+            base_tokens=BASE_TOKENS[self.network],
+        )
+        graph = await self.get_reserves_graph(token_pairs=route_pairs(routes=routes))
+        return best_route_in(
+            graph=graph, amount_out=amount_out, routes=routes, fee=self.swap_fee
+        )
+
+    async def get_swap_route(
+        self, amount_in: int, token_in: str, token_out: str
+    ) -> list:
+        """
+        Finds best route for swap, falling back to the direct pair
+        Args:
+            amount_in (int): Input amount in wei
+            token_in (str): Input token address
+            token_out (str): Output token address
+
+        Returns (list): Token route
+
+        """
+        try:
+            route, _ = await self.get_best_amounts_out(
+                amount_in=amount_in, token_in=token_in, token_out=token_out
+            )
+            return route
+        except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+            logger.exception(e)
+            return [token_in, token_out]
+
     async def get_token(
         self, address: Union[Address, ChecksumAddress, str]
     ) -> ERC20Token:
@@ -278,101 +1256,129 @@ class ERC20Like:
         Returns: Token
 
         """
-        logger.info("Retrieving metadata for token: %s", address)
-        abi = await self.get_contract_abi(abi_type="sell")
-        token_contract = self.web3.eth.contract(address=address, abi=abi)
-
-        name = token_contract.functions.name().call()
-        symbol = token_contract.functions.symbol().call()
-        decimals = token_contract.functions.decimals().call()
-        return ERC20Token(
-            name=name, symbol=symbol, decimals=decimals, network="ETH", address=address
-        )
+        address = Web3.toChecksumAddress(address)
+        token = (await self.get_tokens(addresses=[address])).get(address)
 
+        if token is None:
+            raise BadFunctionCallOutput(f"{address} is not a token contract")
+        return token
 
-class EthereumChain(ERC20Like):
-    def __init__(self):
-        super(EthereumChain, self).__init__()
-        # TODO: Wait for async support
-        self.web3 = Web3(
-            Web3.HTTPProvider(ETHEREUM_MAIN_NET_URL, request_kwargs={"timeout": 60})
-        )
-        self.router_address = self.web3.toChecksumAddress(
-            "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
-        )
-
-    async def get_account_token_holdings(
+    async def iter_account_token_holdings(
         self, address: Union[Address, ChecksumAddress, str] = None
-    ) -> DataFrame:
+    ) -> AsyncIterator[dict]:
         """
-        Retrieves account holding for wallet address
+        Values account holdings of wallet address. Balances of every token the wallet has transferred are read in
+        one multicall, tokens without balance are skipped & the rest are priced concurrently. Rows are yielded as
+        soon as each token is priced
+        Args:
+            address (AddressLike): Wallet address of user
 
-        Returns (dict): User account holdings
+        Returns (AsyncIterator[dict]): Symbol, balance & USD value of every held token
 
         """
         if not address:
             address = self.address
         logger.info("Gathering account holdings for %s", address)
-        account_holdings = []
         holdings = {
-            "ETH": {
-                "address": self.web3.toChecksumAddress(CONTRACT_ADDRESSES["ETH"]),
-                "decimals": 18,
-            }
+            NATIVE_TOKEN_ADDRESS: {"symbol": self.native_symbol, "decimals": 18},
+            **await get_wallet_tokens(network=self.network, address=address),
         }
-        async with aiohttp.ClientSession() as session:
-            url = "https://api.etherscan.io/api"
-            params = {
-                "module": "account",
-                "action": "tokentx",
-                "address": self.address,
-                "startblock": 0,
-                "endblock": 99999999,
-                "sort": "desc",
-                "apikey": ETHERSCAN_API_KEY,
-            }
-            async with session.get(url, params=params) as response:
-                data = await response.json()
-                erc20_transfers = data["result"]
+        tokens = list(holdings)
+        balances = await self.get_token_balances(address=address, tokens=tokens)
+        semaphore = asyncio.Semaphore(HOLDINGS_PRICING_CONCURRENCY)
 
-        for transfer in erc20_transfers:
-            holdings.update(
-                {
-                    transfer["tokenSymbol"]: {
-                        "address": self.web3.toChecksumAddress(
-                            transfer["contractAddress"]
-                        ),
-                        "decimals": int(transfer["tokenDecimal"]),
-                    }
-                }
+        async def value_holding(token: str, quantity: Wei) -> Optional[dict]:
+            coin = holdings[token]
+            try:
+                async with semaphore:
+                    token_price = await self.get_token_price(
+                        token=token, decimals=coin["decimals"]
+                    )
+            except (ContractLogicError, BadFunctionCallOutput, ValueError) as e:
+                logger.exception(e)
+                return None
+
+            # Quantity in correct format as seen in wallet
+            balance = self.get_decimal_representation(
+                quantity=quantity, decimals=coin["decimals"]
             )
-        for key, value in holdings.items():
-            coin = value
-            token = coin["address"]
-            token_decimals = coin["decimals"]
+            usd_amount = (balance * token_price).quantize(Decimal("0.01"))
+            return {"Symbol": coin["symbol"], "Balance": balance, "USD": usd_amount}
+
+        tasks = [
+            asyncio.ensure_future(value_holding(token=token, quantity=quantity))
+            for token, quantity in zip(tokens, balances)
+            if quantity > 0
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                row = await task
 
-            # Quantity in wei used to calculate price
-            quantity = await self.get_token_balance(address=address, token=token)
+                if row:
+                    yield row
+        finally:
+            # Consumer stopped early, pricing of remaining tokens is no longer needed
+            for task in tasks:
+                task.cancel()
 
-            if quantity > 0:
-                try:
-                    token_price = await self.get_token_price(
-                        token=token, decimals=token_decimals
-                    )
+    async def get_account_token_holdings(
+        self, address: Union[Address, ChecksumAddress, str] = None
+    ) -> DataFrame:
+        """
+        Retrieves account holding for wallet address
+        Args:
+            address (AddressLike): Wallet address of user
 
-                    # Quantity in correct format as seen in wallet
-                    quantity = self.get_decimal_representation(
-                        quantity=quantity, decimals=coin["decimals"]
-                    )
-                    price = quantity * token_price
-                    usd_amount = price.quantize(Decimal("0.01"))
-                    account_holdings.append(
-                        {"Symbol": key, "Balance": quantity, "USD": usd_amount}
-                    )
+        Returns (DataFrame): User account holdings
 
-                except (ContractLogicError, BadFunctionCallOutput) as e:
-                    logger.exception(e)
-        return DataFrame(account_holdings)
+        """
+        return DataFrame(
+            [row async for row in self.iter_account_token_holdings(address=address)]
+        )
+
+    async def quote_token_price(self, token, decimals):
+        raise NotImplementedError
+
+    async def get_token_price(
+        self, token: Union[Address, ChecksumAddress, str], decimals: int = 18
+    ) -> Decimal:
+        """
+        Gets token price in USD. Prices are shared across wrappers & computed at most once per block
+        Args:
+            token (AddressLike): Contract Address of coin
+            decimals (int): Token decimals
+
+        Returns (Decimal): Token price in USD
+
+        """
+        token = Web3.toChecksumAddress(token)
+        return await token_price_cache.get(
+            network=self.network,
+            token=token,
+            decimals=decimals,
+            block_number=await self.get_block_watcher().current_block_number(),
+            compute=lambda: self.quote_token_price(token=token, decimals=decimals),
+        )
+
+
+class EthereumChain(ERC20Like):
+    def __init__(self):
+        super(EthereumChain, self).__init__()
+        self.network = "ETH"
+        self.network_name = "Ethereum Network"
+        self.native_symbol = "ETH"
+        self.ws_url = ETHEREUM_MAIN_NET_WS_URL
+        self.explorer_url = "https://etherscan.io"
+        self.web3 = get_web3(network=self.network, urls=ETHEREUM_MAIN_NET_URLS)
+        self.factory_address = self.web3.toChecksumAddress(
+            "0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f"
+        )
+        self.pair_init_code_hash = (
+            "0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f"
+        )
+        self.router_address = self.web3.toChecksumAddress(
+            "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
+        )
 
     async def get_token_balance(
         self,
@@ -390,14 +1396,10 @@ class EthereumChain(ERC20Like):
         """
         logger.info("Retrieving token balance for %s", address)
         if token == CONTRACT_ADDRESSES["ETH"]:
-            return self.web3.eth.get_balance(address)
-
-        abi = await self.get_contract_abi(abi_type="sell")
-        contract = self.web3.eth.contract(address=token, abi=abi)
-        return contract.functions.balanceOf(address).call()
+            return await self.get_native_balance(address=address)
 
-    async def get_token_price(self, token, decimals):
-        raise NotImplementedError
+        contract = self.get_contract(address=token, abi_type="sell")
+        return await run_sync(contract.functions.balanceOf(address).call)
 
 
 class UniSwap(EthereumChain):
@@ -407,11 +1409,11 @@ class UniSwap(EthereumChain):
         self.key = key
         self.fernet = Fernet(FERNET_KEY)
 
-    async def get_token_price(
+    async def quote_token_price(
         self, token: Union[Address, ChecksumAddress, str], decimals: int = 18
     ) -> Decimal:
         """
-        Gets token price in USDC
+        Computes token price in USDC
         Args:
             token (AddressLike): Contract Address of coin
             decimals (int): Token decimals
@@ -423,120 +1425,99 @@ class UniSwap(EthereumChain):
         usdc = CONTRACT_ADDRESSES["USDC"]
         eth = CONTRACT_ADDRESSES["ETH"]
         weth = CONTRACT_ADDRESSES["WETH"]
-        route = [usdc, weth, token] if token not in (eth, weth) else [usdc, weth]
         qty = 10 ** decimals
 
-        await self.set_router_contract()
-
         try:
-            token_price = self.web3.fromWei(
-                self.router_contract.functions.getAmountsIn(qty, route).call()[0],
-                "mwei",
+            _, amounts = await self.get_best_amounts_in(
+                amount_out=qty, token_in=usdc, token_out=weth if token == eth else token
             )
-        except ContractLogicError:
+            token_price = self.web3.fromWei(amounts[0], "mwei")
+        except (InsufficientLiquidityError, BadFunctionCallOutput):
             token_price = 0
         return token_price
 
-    async def swap_tokens(
+    async def broadcast_swap(
         self,
         token: str,
         amount_to_spend: Union[int, float, Decimal] = 0,
         side: str = BUY,
         is_snipe: bool = False,
+        chat_id: Optional[int] = None,
     ) -> str:
         """
-        Swaps crypto coins on PancakeSwap
+        Builds, signs & broadcasts swap on UniSwap. Errors are only raised before the swap is broadcast
         Args:
             token (str): Address of coin to buy/sell
-            amount_to_spend (float): Amount in BNB expected to spend/receive. When selling will read as percentage
+            amount_to_spend (float): Amount in ETH expected to spend/receive. When selling will read as percentage
             side (str): Indicates if user wants to buy or sell coins
             is_snipe (bool): Indicates if swap is for sniping. Utilizes increasingly high gas price to ensure buying
                 token as soon as possible
+            chat_id (int): Telegram chat notified once swap is mined or fails
 
-        Returns: Reply to message
+        Returns (str): Swap transaction hash
 
         """
-        logger.info("Swapping tokens")
         await self.set_router_contract()
-
-        if self.web3.isConnected():
-            token = self.web3.toChecksumAddress(token)
-            weth = CONTRACT_ADDRESSES["WETH"]
-            gas_price = (
-                await self.get_gas_price(speed=AVERAGE_TRANSACTION_SPEED)
-                if not is_snipe
-                else await self.get_gas_price(speed=FAST_TRANSACTION_SPEED)
+        token = self.web3.toChecksumAddress(token)
+        weth = CONTRACT_ADDRESSES["WETH"]
+        speed = AVERAGE_TRANSACTION_SPEED if not is_snipe else FAST_TRANSACTION_SPEED
+        fees = await self.get_transaction_fees(speed=speed)
+        contract = self.get_contract(address=self.router_address, abi_type="router")
+        token_contract = self.get_contract(address=token, abi_type="sell")
+
+        if side == BUY:
+            needs_approval = False
+            amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
+            route = (
+                [weth, token]
+                if is_snipe
+                else await self.get_swap_route(
+                    amount_in=amount_to_spend, token_in=weth, token_out=token
+                )
+            )
+            args = (contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_eth_for_tokens,
+                self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(
+                address=self.address, token=CONTRACT_ADDRESSES["ETH"]
+            )
+        else:
+            amount_to_spend = await self.get_token_balance(
+                address=self.address, token=token  # type: ignore
+            )
+            route = await self.get_swap_route(
+                amount_in=amount_to_spend, token_in=token, token_out=weth
+            )
+            args = (contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_tokens_for_eth,
+                self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
+            needs_approval = await self._needs_approval(
+                contract=token_contract,
+                token=token,  # type: ignore
+                balance=balance,
             )
-            try:
-                txn = None
-                abi = self.get_contract_abi(abi_type="router")
-                token_abi = self.get_contract_abi(abi_type="sell")
-                contract = self.web3.eth.contract(address=self.router_address, abi=abi)
-                token_contract = self.web3.eth.contract(address=token, abi=token_abi)
-
-                if side == BUY:
-                    amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
-                    route = [weth, token]
-                    args = (contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_eth_for_tokens,
-                        self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = await self.get_token_balance(
-                        address=self.address, token=CONTRACT_ADDRESSES["ETH"]
-                    )
-                else:
-                    amount_to_spend = self.get_token_balance(
-                        address=self.address, token=token  # type: ignore
-                    )
-                    route = [token, CONTRACT_ADDRESSES["WETH"]]
-                    args = (contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_tokens_for_eth,
-                        self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
-                    await self._check_approval(
-                        contract=token_contract,
-                        token=token,  # type: ignore
-                        balance=balance,
-                    )
-
-                if balance < amount_to_spend:
-                    raise ValueError(f"Insufficient balance. Had {balance}, needed {amount_to_spend}")  # type: ignore
 
-                for swap_method in swap_methods:
-                    try:
-                        txn = swap_method(*args)  # type: ignore
-                        break
-                    except ContractLogicError as e:
-                        logger.exception(e)
+        if balance < amount_to_spend:
+            raise ValueError(f"Insufficient balance. Had {balance}, needed {amount_to_spend}")  # type: ignore
 
-                signed_txn = self.web3.eth.account.sign_transaction(
-                    txn, private_key=self.fernet.decrypt(self.key.encode()).decode()
-                )
-                txn_hash = self.web3.toHex(
-                    self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                )
-                logger.info("Transaction completed successfully")
-                txn_hash_url = f"https://etherscan.io/tx/{txn_hash}"
-                reply = f"Transactions completed successfully. {link(title='View Transaction', url=txn_hash_url)}"
-
-                # Pre-approve token for future swaps
-                await self._check_approval(
-                    contract=token_contract,
-                    token=token,  # type: ignore
-                    balance=self.get_token_balance(address=self.address, token=token),  # type: ignore
-                )
-            except ValueError as e:
-                logger.exception(e)
-                reply = str(e)
-        else:
-            logger.info("Unable to connect to Polygon Network")
-            reply = "⚠ Sorry, I was unable to connect to the Ethereum Network. Try again later."
-        return reply
+        txn_hash = await self._send_swap(
+            token=token,
+            side=side,
+            swap_methods=swap_methods,
+            args=args,
+            approve_contract=token_contract if needs_approval else None,
+        )
+        logger.info("Transaction completed successfully")
+        swap_receipt = self.track_transaction(
+            txn_hash=txn_hash, chat_id=chat_id, description="Swap"
+        )
 
-    @staticmethod
-    async def get_gas_price(speed: str):
-        gas_prices = await gas_tracker.get_gasprices()
-        return gas_prices[speed]
+        # Pre-approve token for future swaps once bought
+        if side == BUY:
+            self.pre_approve(contract=token_contract, swap_receipt=swap_receipt)
+        return txn_hash
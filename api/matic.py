@@ -1,18 +1,21 @@
 from decimal import Decimal
-from typing import Union
+from typing import Optional, Union
 
-import aiohttp
-import requests
-from aiogram.utils.markdown import link
 from cryptography.fernet import Fernet
-from pandas import DataFrame
 from web3 import Web3
-from web3.exceptions import ContractLogicError, BadFunctionCallOutput
+from web3.exceptions import BadFunctionCallOutput
 from web3.types import Wei, Address, ChecksumAddress
 
+from api.amm import InsufficientLiquidityError
 from api.eth import ERC20Like
+from api.rpc import get_web3, run_sync
 from app import logger
-from config import FERNET_KEY, POLYGONSCAN_API_KEY, HEADERS, BUY
+from config import (
+    FERNET_KEY,
+    BUY,
+    MATIC_CHAIN_URLS,
+    MATIC_CHAIN_WS_URL,
+)
 
 CONTRACT_ADDRESSES = {
     "MATIC": Web3.toChecksumAddress("0x0000000000000000000000000000000000000000"),
@@ -23,101 +26,26 @@ CONTRACT_ADDRESSES = {
 AVERAGE_TRANSACTION_SPEED = "average"
 FAST_TRANSACTION_SPEED = "fastest"
 
-TRANSACTION_SPEEDS = {
-    "slow": "safeLow",
-    "average": "standard",
-    "fast": "fast",
-    "fastest": "fastest",
-}
-
-MATIC_CHAIN_URL = "https://polygon-rpc.com"
-
 
 class PolygonChain(ERC20Like):
     def __init__(self):
         super(PolygonChain, self).__init__()
-        self.web3 = Web3(
-            Web3.HTTPProvider(MATIC_CHAIN_URL, request_kwargs={"timeout": 60})
-        )
+        self.network = "MATIC"
+        self.network_name = "Polygon Network"
+        self.native_symbol = "MATIC"
+        self.ws_url = MATIC_CHAIN_WS_URL
+        self.explorer_url = "https://polygonscan.com"
+        self.web3 = get_web3(network=self.network, urls=MATIC_CHAIN_URLS)
         self.factory_address = self.web3.toChecksumAddress(
             "0x5757371414417b8C6CAad45bAeF941aBc7d3Ab32"
         )
+        self.pair_init_code_hash = (
+            "0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f"
+        )
         self.router_address = self.web3.toChecksumAddress(
             "0xa5E0829CaCEd8fFDD4De3c43696c57F7D7A678ff"
         )
 
-    async def get_account_token_holdings(
-        self, address: Union[Address, ChecksumAddress, str] = None
-    ) -> DataFrame:
-        """
-        Retrieves account holding for wallet address
-        Args:
-            address (AddressLike): Wallet address of user
-
-        Returns (dict): User account holdings
-
-        """
-        if not address:
-            address = self.address
-        logger.info("Gathering account holdings for %s", address)
-        account_holdings = []
-        holdings = {
-            "MATIC": {
-                "address": self.web3.toChecksumAddress(CONTRACT_ADDRESSES["MATIC"]),
-                "decimals": 18,
-            }
-        }
-
-        url = (
-            f"https://api.polygonscan.com/api?module=account&action=tokentx&address={address}"  # type: ignore
-            f"&sort=desc&apikey={POLYGONSCAN_API_KEY}"
-        )
-
-        async with aiohttp.ClientSession() as session, session.get(
-            url, headers=HEADERS
-        ) as response:
-            data = await response.json()
-        erc20_transfers = data["result"]
-
-        for transfer in erc20_transfers:
-            holdings.update(
-                {
-                    transfer["tokenSymbol"]: {
-                        "address": self.web3.toChecksumAddress(
-                            transfer["contractAddress"]
-                        ),
-                        "decimals": int(transfer["tokenDecimal"]),
-                    }
-                }
-            )
-        for key, value in holdings.items():
-            coin = value
-            token = coin["address"]
-            token_decimals = coin["decimals"]
-
-            # Quantity in wei used to calculate price
-            quantity = await self.get_token_balance(address=address, token=token)
-
-            if quantity > 0:
-                try:
-                    token_price = await self.get_token_price(
-                        token=token, decimals=token_decimals
-                    )
-
-                    # Quantity in correct format as seen in wallet
-                    quantity = self.get_decimal_representation(
-                        quantity=quantity, decimals=coin["decimals"]
-                    )
-                    price = quantity * token_price
-                    usd_amount = price.quantize(Decimal("0.01"))
-                    account_holdings.append(
-                        {"Symbol": key, "Balance": quantity, "USD": usd_amount}
-                    )
-
-                except (ContractLogicError, BadFunctionCallOutput) as e:
-                    logger.exception(e)
-        return DataFrame(account_holdings)
-
     async def get_token_balance(
         self,
         address: Union[Address, ChecksumAddress, str],
@@ -134,14 +62,10 @@ class PolygonChain(ERC20Like):
         """
         logger.info("Retrieving token balance for %s", address)
         if token == CONTRACT_ADDRESSES["MATIC"]:
-            return self.web3.eth.get_balance(address)
-
-        abi = await self.get_contract_abi(abi_type="sell")
-        contract = self.web3.eth.contract(address=token, abi=abi)
-        return contract.functions.balanceOf(address).call()
+            return await self.get_native_balance(address=address)
 
-    async def get_token_price(self, token, decimals):
-        raise NotImplementedError
+        contract = self.get_contract(address=token, abi_type="sell")
+        return await run_sync(contract.functions.balanceOf(address).call)
 
 
 class QuickSwap(PolygonChain):
@@ -151,11 +75,11 @@ class QuickSwap(PolygonChain):
         self.key = key
         self.fernet = Fernet(FERNET_KEY)
 
-    async def get_token_price(
+    async def quote_token_price(
         self, token: Union[Address, ChecksumAddress, str], decimals: int = 18
     ) -> Decimal:
         """
-        Gets token price in USDC
+        Computes token price in USDC
         Args:
             token (AddressLike): Contract Address of coin
             decimals (int): Token decimals
@@ -165,130 +89,105 @@ class QuickSwap(PolygonChain):
         """
         logger.info("Retrieving token price in USDC for %s", token)
 
-        await self.set_router_contract()
         usdc = CONTRACT_ADDRESSES["USDC"]
         matic = CONTRACT_ADDRESSES["MATIC"]
         wmatic = CONTRACT_ADDRESSES["WMATIC"]
-        route = (
-            [usdc, wmatic, token] if token not in (matic, wmatic) else [usdc, wmatic]
-        )
         qty = 10 ** decimals
 
         try:
-            token_price = self.web3.fromWei(
-                self.router_contract.functions.getAmountsIn(qty, route).call()[0],
-                "mwei",
+            _, amounts = await self.get_best_amounts_in(
+                amount_out=qty,
+                token_in=usdc,
+                token_out=wmatic if token == matic else token,
             )
-        except ContractLogicError:
+            token_price = self.web3.fromWei(amounts[0], "mwei")
+        except (InsufficientLiquidityError, BadFunctionCallOutput):
             token_price = 0
         return token_price
 
-    @staticmethod
-    def get_gas_price(speed: str):
-        gas_prices = requests.get(
-            "https://gasstation-mainnet.matic.network/", timeout=5
-        ).json()
-        return gas_prices[TRANSACTION_SPEEDS[speed]]
-
-    async def swap_tokens(
+    async def broadcast_swap(
         self,
         token: str,
         amount_to_spend: Union[int, float, Decimal] = 0,
         side: str = BUY,
         is_snipe: bool = False,
+        chat_id: Optional[int] = None,
     ) -> str:
         """
-        Swaps crypto coins on PancakeSwap
+        Builds, signs & broadcasts swap on QuickSwap. Errors are only raised before the swap is broadcast
         Args:
             token (str): Address of coin to buy/sell
-            amount_to_spend (float): Amount in BNB expected to spend/receive. When selling will read as percentage
+            amount_to_spend (float): Amount in MATIC expected to spend/receive. When selling will read as percentage
             side (str): Indicates if user wants to buy or sell coins
             is_snipe (bool): Indicates if swap is for sniping. Utilizes increasingly high gas price to ensure buying
                 token as soon as possible
+            chat_id (int): Telegram chat notified once swap is mined or fails
 
-        Returns: Reply to message
+        Returns (str): Swap transaction hash
 
         """
-        logger.info("Swapping tokens")
         await self.set_router_contract()
-        if self.web3.isConnected():
-            token = self.web3.toChecksumAddress(token)
-            wmatic = CONTRACT_ADDRESSES["WMATIC"]
-            gas_price = (
-                self.web3.toWei(
-                    self.get_gas_price(speed=AVERAGE_TRANSACTION_SPEED), "gwei"
-                )
-                if not is_snipe
-                else self.web3.toWei(
-                    self.get_gas_price(speed=FAST_TRANSACTION_SPEED), "gwei"
+        token = self.web3.toChecksumAddress(token)
+        wmatic = CONTRACT_ADDRESSES["WMATIC"]
+        speed = AVERAGE_TRANSACTION_SPEED if not is_snipe else FAST_TRANSACTION_SPEED
+        fees = await self.get_transaction_fees(speed=speed)
+        token_contract = self.get_contract(address=token, abi_type="sell")
+
+        if side == BUY:
+            needs_approval = False
+            amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
+            route = (
+                [wmatic, token]
+                if is_snipe
+                else await self.get_swap_route(
+                    amount_in=amount_to_spend, token_in=wmatic, token_out=token
                 )
             )
-            try:
-                txn = None
-                token_abi = await self.get_contract_abi(abi_type="sell")
-                token_contract = self.web3.eth.contract(address=token, abi=token_abi)
-
-                if side == BUY:
-                    amount_to_spend = self.web3.toWei(amount_to_spend, "ether")
-                    route = [wmatic, token]
-                    args = (self.router_contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_eth_for_tokens,
-                        self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = self.get_token_balance(
-                        address=self.address, token=CONTRACT_ADDRESSES["MATIC"]
-                    )
-                else:
-
-                    amount_to_spend = self.get_token_balance(
-                        address=self.address, token=token  # type: ignore
-                    )
-                    route = [token, CONTRACT_ADDRESSES["WMATIC"]]
-                    args = (self.router_contract, route, amount_to_spend, gas_price)
-                    swap_methods = [
-                        self._swap_exact_tokens_for_eth,
-                        self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
-                    ]
-                    balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
-                    await self._check_approval(
-                        contract=token_contract,
-                        token=token,
-                        balance=balance,
-                    )
-
-                if balance < amount_to_spend:
-                    raise ValueError(
-                        f"Insufficient balance. Had {balance}, neded {amount_to_spend}"
-                    )
+            args = (self.router_contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_eth_for_tokens,
+                self._swap_exact_eth_for_tokens_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(
+                address=self.address, token=CONTRACT_ADDRESSES["MATIC"]
+            )
+        else:
+            amount_to_spend = await self.get_token_balance(
+                address=self.address, token=token  # type: ignore
+            )
+            route = await self.get_swap_route(
+                amount_in=amount_to_spend, token_in=token, token_out=wmatic
+            )
+            args = (self.router_contract, route, amount_to_spend, fees)
+            swap_methods = [
+                self._swap_exact_tokens_for_eth,
+                self._swap_exact_tokens_for_eth_supporting_fee_on_transfer_tokens,
+            ]
+            balance = await self.get_token_balance(address=self.address, token=token)  # type: ignore
+            needs_approval = await self._needs_approval(
+                contract=token_contract,
+                token=token,
+                balance=balance,
+            )
 
-                for swap_method in swap_methods:
-                    try:
-                        txn = swap_method(*args)
-                        break
-                    except ContractLogicError as e:
-                        logger.exception(e)
+        if balance < amount_to_spend:
+            raise ValueError(
+                f"Insufficient balance. Had {balance}, neded {amount_to_spend}"
+            )
 
-                signed_txn = self.web3.eth.account.sign_transaction(
-                    txn, private_key=self.fernet.decrypt(self.key.encode()).decode()
-                )
-                txn_hash = self.web3.toHex(
-                    self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                )
-                logger.info("Transaction completed successfully")
-                txn_hash_url = f"https://polygonscan.com/tx/{txn_hash}"
-                reply = f"Transactions completed successfully. {link(title='View Transaction', url=txn_hash_url)}"
+        txn_hash = await self._send_swap(
+            token=token,
+            side=side,
+            swap_methods=swap_methods,
+            args=args,
+            approve_contract=token_contract if needs_approval else None,
+        )
+        logger.info("Transaction completed successfully")
+        swap_receipt = self.track_transaction(
+            txn_hash=txn_hash, chat_id=chat_id, description="Swap"
+        )
 
-                # Pre-approve token for future swaps
-                await self._check_approval(
-                    contract=token_contract,
-                    token=token,
-                    balance=self.get_token_balance(address=self.address, token=token),  # type: ignore
-                )
-            except ValueError as e:
-                logger.exception(e)
-                reply = str(e)
-        else:
-            logger.info("Unable to connect to Polygon Network")
-            reply = "⚠ Sorry, I was unable to connect to the Polygon Network. Try again later."
-        return reply
+        # Pre-approve token for future swaps once bought
+        if side == BUY:
+            self.pre_approve(contract=token_contract, swap_receipt=swap_receipt)
+        return txn_hash
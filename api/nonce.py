@@ -0,0 +1,157 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+from web3 import Web3
+
+from api.rpc import batch_request
+from app import logger
+
+
+class NonceManager:
+    """
+    Reserves transaction nonces locally so concurrent transactions from the same wallet never share a nonce. Nonces
+    handed back before being broadcast are reused first, and the local nonce is only reread from the chain once no
+    reservation is outstanding
+    """
+
+    def __init__(self, web3: Web3, address: str):
+        self.web3 = web3
+        self.address = address
+        self.next_nonce: Optional[int] = None
+        self.outstanding: Set[int] = set()
+        self.released: Set[int] = set()
+        self.needs_resync = False
+        self.lock = asyncio.Lock()
+
+    async def _sync(self) -> int:
+        if self.next_nonce is None:
+            nonce = await batch_request(
+                web3=self.web3,
+                method="eth_getTransactionCount",
+                params=[self.address, "pending"],
+            )
+            self.next_nonce = int(nonce, 16)
+            logger.info("Synced nonce of %s at %d", self.address, self.next_nonce)
+        return self.next_nonce
+
+    async def reserve(self) -> int:
+        """
+        Reserves lowest free nonce. Reservation is held until the nonce is marked as sent, released or resynced
+
+        Returns (int): Reserved nonce
+
+        """
+        async with self.lock:
+            next_nonce = await self._sync()
+
+            if self.released:
+                nonce = min(self.released)
+                self.released.discard(nonce)
+            else:
+                nonce = next_nonce
+                self.next_nonce = nonce + 1
+            self.outstanding.add(nonce)
+            return nonce
+
+    async def peek(self) -> int:
+        """
+        Retrieves the nonce the next reservation would get without reserving it, so transactions can be signed
+        ahead of time without holding up other transactions
+
+        Returns (int): Next free nonce
+
+        """
+        async with self.lock:
+            next_nonce = await self._sync()
+            return min(self.released) if self.released else next_nonce
+
+    async def reserve_exact(self, nonce: int) -> bool:
+        """
+        Reserves a specific nonce, e.g. the one a transaction was signed with ahead of time
+        Args:
+            nonce (int): Nonce to reserve
+
+        Returns (bool): False if nonce was handed to another transaction meanwhile
+
+        """
+        async with self.lock:
+            next_nonce = await self._sync()
+
+            if nonce in self.released:
+                self.released.discard(nonce)
+            elif nonce == next_nonce:
+                self.next_nonce = nonce + 1
+            else:
+                return False
+            self.outstanding.add(nonce)
+            return True
+
+    def sent(self, nonce: int) -> None:
+        """
+        Marks reserved nonce as broadcast
+        Args:
+            nonce (int): Broadcast nonce
+
+        """
+        self.outstanding.discard(nonce)
+        self._resync_if_idle()
+
+    def release(self, nonce: int) -> None:
+        """
+        Hands back a reserved nonce that was never broadcast, so the next reservation fills the gap
+        Args:
+            nonce (int): Unused nonce
+
+        """
+        if nonce not in self.outstanding:
+            return
+        self.outstanding.discard(nonce)
+        self.released.add(nonce)
+
+        # Gaps at the top of the range are simply never handed out
+        while self.next_nonce is not None and self.next_nonce - 1 in self.released:
+            self.next_nonce -= 1
+            self.released.discard(self.next_nonce)
+        self._resync_if_idle()
+
+    def resync(self, nonce: Optional[int] = None) -> None:
+        """
+        Rereads nonce from the chain's pending transaction count once no reservation is outstanding. Fills gaps
+        left by failed broadcasts and picks up transactions sent outside the bot
+        Args:
+            nonce (int): Reserved nonce whose broadcast failed, if any
+
+        """
+        if nonce is not None:
+            self.outstanding.discard(nonce)
+        self.needs_resync = True
+        self._resync_if_idle()
+
+    def _resync_if_idle(self) -> None:
+        # Rereading while nonces are held could hand out a nonce another task is about to broadcast
+        if self.needs_resync and not self.outstanding:
+            logger.info("Resyncing nonce of %s", self.address)
+            self.next_nonce = None
+            self.released.clear()
+            self.needs_resync = False
+
+
+nonce_managers: Dict[Tuple[str, str], NonceManager] = {}
+
+
+def get_nonce_manager(network: str, web3: Web3, address: str) -> NonceManager:
+    """
+    Retrieves the nonce manager of a wallet
+    Args:
+        network (str): Network name
+        web3 (Web3): Web3 instance of network
+        address (str): Wallet address
+
+    Returns (NonceManager): Wallet nonce manager
+
+    """
+    key = (network, address)
+
+    if key not in nonce_managers:
+        nonce_managers[key] = NonceManager(web3=web3, address=address)
+    return nonce_managers[key]
@@ -0,0 +1,54 @@
+import asyncio
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Tuple
+
+
+class TokenPriceCache:
+    """
+    Token prices per (network, token, decimals), valid for the block they were computed at. Concurrent lookups of a
+    price share one computation, so each token is priced at most once per block across the whole process
+    """
+
+    def __init__(self):
+        self.prices: Dict[Tuple[str, str, int], Tuple[int, asyncio.Future]] = {}
+
+    def _discard(self, key: Tuple[str, str, int], future: asyncio.Future) -> None:
+        # Failed computations are dropped so the next lookup retries
+        if future.cancelled() or future.exception() is not None:
+            if self.prices.get(key, (0, None))[1] is future:
+                del self.prices[key]
+
+    async def get(
+        self,
+        network: str,
+        token: str,
+        decimals: int,
+        block_number: int,
+        compute: Callable[[], Awaitable[Decimal]],
+    ) -> Decimal:
+        """
+        Retrieves token price at block, computing it only if no lookup at this block has started yet
+        Args:
+            network (str): Network name
+            token (str): Token address
+            decimals (int): Token decimals
+            block_number (int): Current block number
+            compute (Callable): Coroutine function computing the price
+
+        Returns (Decimal): Token price
+
+        """
+        key = (network, token, decimals)
+        price = self.prices.get(key)
+
+        if price is None or price[0] < block_number:
+            future = asyncio.ensure_future(compute())
+            future.add_done_callback(lambda f: self._discard(key=key, future=f))
+            price = (block_number, future)
+            self.prices[key] = price
+
+        # Shielded so a caller giving up doesn't cancel the price other callers wait for
+        return await asyncio.shield(price[1])
+
+
+token_price_cache = TokenPriceCache()
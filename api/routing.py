@@ -0,0 +1,181 @@
+from itertools import permutations
+from typing import Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from api.amm import (
+    InsufficientLiquidityError,
+    get_amount_in,
+    get_amount_out,
+    sort_tokens,
+)
+
+# Tokens most liquidity is paired with. Routes hop through at most two of them
+BASE_TOKENS = {
+    "BSC": [
+        Web3.toChecksumAddress("0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c"),  # WBNB
+        Web3.toChecksumAddress("0xe9e7cea3dedca5984780bafc599bd69add087d56"),  # BUSD
+        Web3.toChecksumAddress("0x55d398326f99059ff775485246999027b3197955"),  # USDT
+        Web3.toChecksumAddress("0x8ac76a51cc950d9822d68b83fe1ad97b32cd580d"),  # USDC
+    ],
+    "ETH": [
+        Web3.toChecksumAddress("0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),  # WETH
+        Web3.toChecksumAddress("0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"),  # USDC
+        Web3.toChecksumAddress("0xdac17f958d2ee523a2206206994597c13d831ec7"),  # USDT
+        Web3.toChecksumAddress("0x6b175474e89094c44da98b954eedeac495271d0f"),  # DAI
+    ],
+    "MATIC": [
+        Web3.toChecksumAddress("0x0d500b1d8e8ef31e21c99d1db9a6444d3adf1270"),  # WMATIC
+        Web3.toChecksumAddress("0x2791bca1f2de4661ed88a30c99a7a9449aa84174"),  # USDC
+        Web3.toChecksumAddress("0xc2132d05d31c914a87c6611c10748aeb04b58e8f"),  # USDT
+        Web3.toChecksumAddress("0x7ceb23fd6bc0add59e62ac25578270cff1b9f619"),  # WETH
+    ],
+}
+MAX_HOPS = 3
+
+
+class ReservesGraph:
+    """Pair reserves keyed by token, so the reserves of any hop are looked up without knowing the pair address"""
+
+    def __init__(self):
+        self.edges: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    def add_pair(
+        self, token_0: str, token_1: str, reserve_0: int, reserve_1: int
+    ) -> None:
+        """
+        Adds pair reserves to graph
+        Args:
+            token_0 (str): Pair token0 address
+            token_1 (str): Pair token1 address
+            reserve_0 (int): Pair reserve of token0
+            reserve_1 (int): Pair reserve of token1
+
+        """
+        self.edges.setdefault(token_0, {})[token_1] = (reserve_0, reserve_1)
+        self.edges.setdefault(token_1, {})[token_0] = (reserve_1, reserve_0)
+
+    def reserves(self, token_in: str, token_out: str) -> Optional[Tuple[int, int]]:
+        """
+        Reserves of a hop
+        Args:
+            token_in (str): Input token address
+            token_out (str): Output token address
+
+        Returns (Optional[tuple]): Reserves of input & output token. None if tokens aren't paired
+
+        """
+        return self.edges.get(token_in, {}).get(token_out)
+
+
+def candidate_routes(
+    token_in: str, token_out: str, base_tokens: List[str], max_hops: int = MAX_HOPS
+) -> List[List[str]]:
+    """
+    Lists routes from token_in to token_out hopping through base tokens
+    Args:
+        token_in (str): Input token address
+        token_out (str): Output token address
+        base_tokens (list): Intermediate token candidates
+        max_hops (int): Maximum number of pairs along a route
+
+    Returns (list): Routes, shortest first
+
+    """
+    intermediates = [
+        token for token in base_tokens if token not in (token_in, token_out)
+    ]
+    return [
+        [token_in, *hops, token_out]
+        for length in range(max_hops)
+        for hops in permutations(intermediates, length)
+    ]
+
+
+def route_pairs(routes: List[List[str]]) -> List[Tuple[str, str]]:
+    """
+    Lists every distinct pair used by routes
+    Args:
+        routes (list): Token routes
+
+    Returns (list): Token pairs, sorted like token0 & token1 of each pair
+
+    """
+    pairs = {
+        sort_tokens(token_in, token_out)
+        for route in routes
+        for token_in, token_out in zip(route, route[1:])
+    }
+    return list(pairs)
+
+
+def best_route_out(
+    graph: ReservesGraph, amount_in: int, routes: List[List[str]], fee: int
+) -> Tuple[List[str], List[int]]:
+    """
+    Finds the route yielding the highest output for an exact input amount
+    Args:
+        graph (ReservesGraph): Pair reserves
+        amount_in (int): Input amount in wei
+        routes (list): Candidate routes
+        fee (int): Swap fee in basis points
+
+    Returns (tuple): Best route & amounts for every token in route
+
+    """
+    best: Optional[Tuple[List[str], List[int]]] = None
+
+    for route in routes:
+        amounts = [amount_in]
+        try:
+            for token_in, token_out in zip(route, route[1:]):
+                reserves = graph.reserves(token_in=token_in, token_out=token_out)
+
+                if reserves is None:
+                    raise InsufficientLiquidityError
+                amounts.append(get_amount_out(amounts[-1], *reserves, fee))
+        except InsufficientLiquidityError:
+            continue
+
+        if best is None or amounts[-1] > best[1][-1]:
+            best = (route, amounts)
+
+    if best is None:
+        raise InsufficientLiquidityError("No route with enough liquidity")
+    return best
+
+
+def best_route_in(
+    graph: ReservesGraph, amount_out: int, routes: List[List[str]], fee: int
+) -> Tuple[List[str], List[int]]:
+    """
+    Finds the route requiring the lowest input for an exact output amount
+    Args:
+        graph (ReservesGraph): Pair reserves
+        amount_out (int): Output amount in wei
+        routes (list): Candidate routes
+        fee (int): Swap fee in basis points
+
+    Returns (tuple): Best route & amounts for every token in route
+
+    """
+    best: Optional[Tuple[List[str], List[int]]] = None
+
+    for route in routes:
+        amounts = [amount_out]
+        try:
+            for token_in, token_out in reversed(list(zip(route, route[1:]))):
+                reserves = graph.reserves(token_in=token_in, token_out=token_out)
+
+                if reserves is None:
+                    raise InsufficientLiquidityError
+                amounts.insert(0, get_amount_in(amounts[0], *reserves, fee))
+        except InsufficientLiquidityError:
+            continue
+
+        if best is None or amounts[0] < best[1][0]:
+            best = (route, amounts)
+
+    if best is None:
+        raise InsufficientLiquidityError("No route with enough liquidity")
+    return best
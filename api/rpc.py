@@ -0,0 +1,329 @@
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from web3 import Web3
+from web3._utils.encoding import FriendlyJsonSerde
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from app import logger
+from config import (
+    RPC_HEALTH_CHECK_INTERVAL,
+    RPC_MAX_BATCH_SIZE,
+    RPC_MAX_BLOCK_LAG,
+    RPC_MAX_WORKERS,
+    RPC_TIMEOUT,
+)
+
+# Weight of the latest request when scoring endpoint latency
+LATENCY_EWMA_ALPHA = 0.3
+
+# Web3 HTTP providers are synchronous, so every chain call runs on this pool instead of the event loop
+executor = ThreadPoolExecutor(max_workers=RPC_MAX_WORKERS, thread_name_prefix="rpc")
+
+
+class RPCTimeoutError(ValueError):
+    """Raised when a chain call does not complete in time"""
+
+
+async def run_sync(
+    func: Callable, *args: Any, timeout: float = RPC_TIMEOUT, **kwargs: Any
+) -> Any:
+    """
+    Runs blocking chain call on the RPC thread pool
+    Args:
+        func (Callable): Blocking function, e.g. web3 method or contract call
+        *args: Positional arguments of func
+        timeout (float): Seconds to wait for result
+        **kwargs: Keyword arguments of func
+
+    Returns (Any): Result of func
+
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(future, timeout=timeout)
+    except asyncio.TimeoutError:
+        name = getattr(func, "__qualname__", repr(func))
+        logger.error("Chain call %s timed out after %ss", name, timeout)
+        raise RPCTimeoutError(f"Chain call {name} timed out after {timeout}s")
+
+
+class RPCNode:
+    """JSON-RPC node reached over a keep-alive session, scored by its exponentially weighted average latency"""
+
+    def __init__(self, url: str, timeout: float = RPC_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.latency = 0.0
+        self.is_healthy = True
+        self.block_number = 0
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Connection pool sized to the RPC thread pool so concurrent calls reuse connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=RPC_MAX_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def record_latency(self, latency: float) -> None:
+        self.latency = (
+            LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency
+            if self.latency
+            else latency
+        )
+
+    def post(self, data: bytes) -> bytes:
+        """
+        Sends encoded JSON-RPC request. Node is flagged unhealthy if it can't be reached
+        Args:
+            data (bytes): Encoded JSON-RPC request
+
+        Returns (bytes): Raw JSON-RPC response
+
+        """
+        started_at = time.perf_counter()
+        try:
+            response = self.session.post(self.url, data=data, timeout=self.timeout)
+            response.raise_for_status()
+        except RequestException:
+            self.is_healthy = False
+            raise
+        self.record_latency(latency=time.perf_counter() - started_at)
+        return response.content
+
+
+class RPCBatcher:
+    """
+    Coalesces JSON-RPC requests issued during the same event loop iteration into a single batch request, so
+    concurrent reads cost one HTTP round trip
+    """
+
+    def __init__(
+        self, provider: "PooledHTTPProvider", max_batch_size: int = RPC_MAX_BATCH_SIZE
+    ):
+        self.provider = provider
+        self.max_batch_size = max_batch_size
+        self.queue: List[Tuple[str, Any, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.Handle] = None
+
+        # Sends in flight are referenced so they aren't garbage collected before resolving their futures
+        self.tasks: Set[asyncio.Task] = set()
+
+    def request(self, method: str, params: Any) -> asyncio.Future:
+        """
+        Queues request for the next batch
+        Args:
+            method (str): JSON-RPC method
+            params (Any): JSON-RPC params
+
+        Returns (asyncio.Future): Resolves to raw result of request
+
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.queue.append((method, params, future))
+
+        if len(self.queue) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_soon(self.flush)
+        return future
+
+    def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        queue, self.queue = self.queue, []
+
+        if queue:
+            task = asyncio.create_task(self.send(queue=queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def send(self, queue: List[Tuple[str, Any, asyncio.Future]]) -> None:
+        error: Optional[Exception] = None
+        try:
+            responses = await run_sync(
+                self.provider.make_batch_request,
+                [(method, params) for method, params, _ in queue],
+            )
+            error = ValueError("No response to batched request")
+
+            for (method, _, future), response in zip(queue, responses):
+                if future.done():
+                    continue
+                if response is None:
+                    future.set_exception(ValueError(f"No response to {method}"))
+                elif "error" in response:
+                    future.set_exception(ValueError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        except (RequestException, ValueError) as e:
+            error = e
+        except Exception as e:
+            logger.exception(e)
+            error = e
+        finally:
+            # Callers never wait forever, whatever stopped the batch. Cancelled sends cancel their requests
+            for *_, future in queue:
+                if future.done():
+                    continue
+                if error is None:
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """
+    Web3 provider routing every request to the fastest healthy node of a chain, failing over to the next node when
+    a node can't be reached
+    """
+
+    def __init__(self, network: str, urls: List[str], timeout: float = RPC_TIMEOUT):
+        super(PooledHTTPProvider, self).__init__()
+        self.network = network
+        self.nodes = [RPCNode(url=url, timeout=timeout) for url in urls if url]
+        self.batcher = RPCBatcher(provider=self)
+
+    def __str__(self) -> str:
+        return f"RPC pool of {self.network} with {len(self.nodes)} nodes"
+
+    def ranked_nodes(self) -> List[RPCNode]:
+        """
+        Orders nodes by preference, healthy nodes first & fastest first. Unhealthy nodes are kept as last resort
+
+        Returns (list): Nodes in order of preference
+
+        """
+        return sorted(self.nodes, key=lambda node: (not node.is_healthy, node.latency))
+
+    def post(self, data: bytes) -> bytes:
+        for node in self.ranked_nodes():
+            try:
+                return node.post(data=data)
+            except RequestException as e:
+                logger.warning("%s RPC node %s failed: %s", self.network, node.url, e)
+        raise requests.exceptions.ConnectionError(
+            f"No {self.network} RPC node is reachable"
+        )
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.decode_rpc_response(
+            self.post(data=self.encode_rpc_request(method, params))
+        )
+
+    def make_batch_request(
+        self, calls: List[Tuple[str, Any]]
+    ) -> List[Optional[RPCResponse]]:
+        """
+        Sends many JSON-RPC requests as a single batch. Results are raw, web3 result formatters are not applied
+        Args:
+            calls (list): Method & params of every request
+
+        Returns (list): Response of every request in order. None if node left a request unanswered
+
+        """
+        if not calls:
+            return []
+        ids = [next(self.request_counter) for _ in calls]
+        data = FriendlyJsonSerde().json_encode(
+            [
+                {"jsonrpc": "2.0", "method": method, "params": params, "id": id_}
+                for id_, (method, params) in zip(ids, calls)
+            ]
+        )
+        responses = json.loads(self.post(data=data.encode()))
+
+        # Nodes reply with a single error object when rejecting the whole batch
+        if not isinstance(responses, list):
+            raise ValueError(responses.get("error", responses))
+        responses_by_id = {response.get("id"): response for response in responses}
+        return [responses_by_id.get(id_) for id_ in ids]
+
+    async def check_health(self) -> None:
+        """
+        Probes chain head of every node. Unreachable nodes & nodes lagging behind the chain head are only used as
+        last resort until they recover
+        """
+        request = self.encode_rpc_request(RPCEndpoint("eth_blockNumber"), [])
+
+        async def probe(node: RPCNode) -> bool:
+            try:
+                response = self.decode_rpc_response(
+                    await run_sync(node.post, request, timeout=node.timeout)
+                )
+                node.block_number = int(response["result"], 16)
+                return True
+            except (RequestException, KeyError, TypeError, ValueError) as e:
+                logger.warning(
+                    "%s RPC node %s is unhealthy: %s", self.network, node.url, e
+                )
+                node.is_healthy = False
+                return False
+
+        reached = await asyncio.gather(*(probe(node) for node in self.nodes))
+        head = max(
+            (node.block_number for node, ok in zip(self.nodes, reached) if ok),
+            default=0,
+        )
+
+        for node, ok in zip(self.nodes, reached):
+            if ok:
+                node.is_healthy = head - node.block_number <= RPC_MAX_BLOCK_LAG
+
+
+async def batch_request(web3: Web3, method: str, params: Any) -> Any:
+    """
+    Sends JSON-RPC request batched together with every other request issued in the same event loop iteration
+    Args:
+        web3 (Web3): Web3 instance backed by an RPC pool
+        method (str): JSON-RPC method
+        params (Any): JSON-RPC params
+
+    Returns (Any): Raw result of request, web3 result formatters are not applied
+
+    """
+    return await web3.provider.batcher.request(method=method, params=params)
+
+
+rpc_pools: Dict[str, PooledHTTPProvider] = {}
+web3_instances: Dict[str, Web3] = {}
+
+
+def get_web3(network: str, urls: List[str]) -> Web3:
+    """
+    Retrieves the Web3 instance of a network, shared by every wrapper so RPC connections are reused
+    Args:
+        network (str): Network name
+        urls (list): RPC node URLs of network
+
+    Returns (Web3): Web3 instance backed by the network RPC pool
+
+    """
+    if network not in web3_instances:
+        rpc_pools[network] = PooledHTTPProvider(network=network, urls=urls)
+        web3_instances[network] = Web3(rpc_pools[network])
+    return web3_instances[network]
+
+
+async def monitor_rpc_pools(interval: float = RPC_HEALTH_CHECK_INTERVAL) -> None:
+    """
+    Health checks RPC nodes of every network in use
+    Args:
+        interval (float): Seconds between health checks
+
+    """
+    while True:
+        for pool in list(rpc_pools.values()):
+            await pool.check_health()
+        await asyncio.sleep(interval)
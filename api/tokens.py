@@ -0,0 +1,109 @@
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic.main import BaseModel
+from web3 import Web3
+from web3.types import Address, ChecksumAddress
+
+from app import logger
+from models import TokenMetadata
+
+TOKEN_LIST_PATH = "data/token_list.json"
+
+# Token list chain ids of supported networks
+CHAIN_IDS = {1: "ETH", 56: "BSC", 137: "MATIC"}
+
+
+class ERC20Token(BaseModel):
+    name: str
+    symbol: str
+    decimals: int
+    network: str
+    address: Union[Address, ChecksumAddress, str]
+
+
+class TokenCache:
+    """
+    Token metadata per (network, address). Seeded from the local token list & the token table, then filled on first
+    miss. Metadata never changes, so tokens are never evicted
+    """
+
+    def __init__(self, token_list_path: str = TOKEN_LIST_PATH):
+        self.token_list_path = token_list_path
+        self.tokens: Dict[Tuple[str, str], ERC20Token] = {}
+        self.is_loaded = False
+
+    def load(self) -> None:
+        """Seeds cache from the local token list & the token table"""
+        try:
+            with open(self.token_list_path, mode="r") as file:
+                token_list = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.exception(e)
+            token_list = {"tokens": []}
+
+        for token in token_list["tokens"]:
+            network = CHAIN_IDS.get(token["chainId"])
+
+            if network:
+                address = Web3.toChecksumAddress(token["address"])
+                self.tokens[(network, address)] = ERC20Token(
+                    name=token["name"],
+                    symbol=token["symbol"],
+                    decimals=token["decimals"],
+                    network=network,
+                    address=address,
+                )
+
+        for token in TokenMetadata.all():
+            self.tokens[(token.network, token.address)] = ERC20Token(
+                name=token.name,
+                symbol=token.symbol,
+                decimals=token.decimals,
+                network=token.network,
+                address=token.address,
+            )
+        self.is_loaded = True
+        logger.info("Loaded metadata of %d tokens", len(self.tokens))
+
+    def get(
+        self, network: str, address: Union[Address, ChecksumAddress, str]
+    ) -> Optional[ERC20Token]:
+        """
+        Retrieves cached token metadata
+        Args:
+            network (str): Network name
+            address (AddressLike): Token contract address
+
+        Returns (Optional[ERC20Token]): Token metadata. None if token is not cached yet
+
+        """
+        if not self.is_loaded:
+            self.load()
+        return self.tokens.get((network, Web3.toChecksumAddress(address)))
+
+    def add(self, token: ERC20Token) -> None:
+        """
+        Caches token metadata & persists it for future runs
+        Args:
+            token (ERC20Token): Token metadata
+
+        """
+        token.address = Web3.toChecksumAddress(token.address)
+        self.tokens[(token.network, token.address)] = token
+        TokenMetadata.save(data=token.dict())
+
+    def add_many(self, tokens: List[ERC20Token]) -> None:
+        """
+        Caches metadata of several tokens & persists them in one transaction
+        Args:
+            tokens (list): Token metadata
+
+        """
+        for token in tokens:
+            token.address = Web3.toChecksumAddress(token.address)
+            self.tokens[(token.network, token.address)] = token
+        TokenMetadata.save_many(data=[token.dict() for token in tokens])
+
+
+token_cache = TokenCache()
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Dict, Tuple
+
+import aiohttp
+from web3 import Web3
+
+from app import logger
+from config import BSCSCAN_API_KEY, ETHERSCAN_API_KEY, HEADERS, POLYGONSCAN_API_KEY
+from models import WalletTokenIndex
+
+EXPLORER_APIS = {
+    "BSC": ("https://api.bscscan.com/api", BSCSCAN_API_KEY),
+    "ETH": ("https://api.etherscan.io/api", ETHERSCAN_API_KEY),
+    "MATIC": ("https://api.polygonscan.com/api", POLYGONSCAN_API_KEY),
+}
+TRANSFERS_PAGE_SIZE = 1000
+
+
+class WalletIndex:
+    """
+    Token contracts a wallet has transferred, along with the last block scanned. Only transfers after that block
+    are fetched from the block explorer on later scans
+    """
+
+    def __init__(
+        self, network: str, address: str, last_block: int = 0, tokens: dict = None
+    ):
+        self.network = network
+        self.address = address
+        self.last_block = last_block
+        self.tokens: Dict[str, dict] = tokens or {}
+        self.lock = asyncio.Lock()
+
+    async def fetch_transfers(
+        self, session: aiohttp.ClientSession, start_block: int, page: int = 1
+    ) -> list:
+        """
+        Fetches a page of token transfers in ascending block order
+        Args:
+            session (aiohttp.ClientSession): HTTP session
+            start_block (int): First block to fetch transfers from
+            page (int): Page number, starting at 1
+
+        Returns (list): Token transfers
+
+        """
+        url, api_key = EXPLORER_APIS[self.network]
+        params = {
+            "module": "account",
+            "action": "tokentx",
+            "address": self.address,
+            "startblock": start_block,
+            "endblock": 99999999,
+            "page": page,
+            "offset": TRANSFERS_PAGE_SIZE,
+            "sort": "asc",
+            "apikey": api_key,
+        }
+        async with session.get(url, params=params, headers=HEADERS) as response:
+            data = await response.json()
+
+        # No transfers is reported as an error status with an empty result
+        if not isinstance(data.get("result"), list):
+            raise ValueError(
+                f"Unable to fetch transfers of {self.address}: {data.get('result')}"
+            )
+        return data["result"]
+
+    async def update(self) -> Dict[str, dict]:
+        """
+        Indexes tokens transferred since the last scanned block. The last scanned block is fetched again since it may
+        have been indexed partially by the explorer. When the explorer can't be reached or rate limits the scan, tokens
+        indexed so far are returned
+
+        Returns (dict): Symbol & decimals per token contract address
+
+        """
+        async with self.lock:
+            start_block = last_block = self.last_block
+            page = 1
+            new_tokens = {}
+            try:
+                async with aiohttp.ClientSession() as session:
+                    while True:
+                        transfers = await self.fetch_transfers(
+                            session=session, start_block=start_block, page=page
+                        )
+
+                        for transfer in transfers:
+                            contract_address = Web3.toChecksumAddress(
+                                transfer["contractAddress"]
+                            )
+                            new_tokens[contract_address] = {
+                                "symbol": transfer["tokenSymbol"],
+                                "decimals": int(transfer["tokenDecimal"]),
+                            }
+                            last_block = max(last_block, int(transfer["blockNumber"]))
+
+                        if len(transfers) < TRANSFERS_PAGE_SIZE:
+                            break
+
+                        if last_block > start_block:
+                            # Last block of page may be cut off, so scan resumes at its first transfer
+                            start_block = last_block
+                            page = 1
+                        else:
+                            # Whole page fell within a single block
+                            page += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(
+                    "Unable to index transfers of %s past block %d: %s",
+                    self.address,
+                    last_block,
+                    e,
+                )
+
+            if last_block > self.last_block or new_tokens.keys() - self.tokens.keys():
+                logger.info(
+                    "Indexed transfers of %s up to block %d", self.address, last_block
+                )
+                self.tokens.update(new_tokens)
+                self.last_block = last_block
+                WalletTokenIndex.save(
+                    network=self.network,
+                    address=self.address,
+                    last_block=self.last_block,
+                    tokens=new_tokens,
+                )
+            return self.tokens
+
+
+wallet_indexes: Dict[Tuple[str, str], WalletIndex] = {}
+
+
+async def get_wallet_tokens(network: str, address: str) -> Dict[str, dict]:
+    """
+    Retrieves tokens a wallet has transferred, scanning only transfers since the last call
+    Args:
+        network (str): Network name
+        address (str): Wallet address
+
+    Returns (dict): Symbol & decimals per token contract address
+
+    """
+    address = Web3.toChecksumAddress(address)
+    key = (network, address)
+
+    if key not in wallet_indexes:
+        index = WalletTokenIndex.get_or_none(network=network, address=address)
+        wallet_indexes[key] = (
+            WalletIndex(
+                network=network,
+                address=address,
+                last_block=index.last_block,
+                tokens=dict(index.tokens),
+            )
+            if index
+            else WalletIndex(network=network, address=address)
+        )
+    return await wallet_indexes[key].update()
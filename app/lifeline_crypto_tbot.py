@@ -4,15 +4,18 @@ from aiogram import executor
 from aiogram.dispatcher.webhook import get_new_configured_app
 from aiohttp import web
 
+from api.rpc import monitor_rpc_pools
 from app import dp, bot
+from app.routers.stats import setup_routes
 from app.routers.webhook import setup_handlers
-from bot.bsc_order import limit_order_executor
+from bot.bsc_order import rehydrate_orders
 from config import TELEGRAM_CHAT_ID, WEBHOOK_PATH, WEBHOOK_URL, WEBAPP_PORT, WEBAPP_HOST
 from handlers import init_database
 from handlers.base import send_message
-from models import Order
-from schemas import LimitOrder
 from services.alerts import price_alert_callback
+from services.gas_oracle import gas_oracle
+from services.metrics import monitor_event_loop_lag
+from services.partition import lease_keeper, release_leases
 
 
 async def on_startup(_):
@@ -24,16 +27,17 @@ async def on_startup(_):
     if webhook_info.url != WEBHOOK_URL:
         await bot.set_webhook(url=WEBHOOK_URL, drop_pending_updates=True)
     setup_handlers(dp)
+    asyncio.create_task(lease_keeper(on_renew=rehydrate_orders))
     asyncio.create_task(price_alert_callback(delay=60))
-
-    for order in Order.all():
-        limit_order = LimitOrder.from_orm(order)
-        asyncio.create_task(limit_order_executor(order=limit_order))
+    asyncio.create_task(monitor_event_loop_lag())
+    asyncio.create_task(monitor_rpc_pools())
+    asyncio.create_task(gas_oracle.run())
     await send_message(channel_id=TELEGRAM_CHAT_ID, message="Up and running! 👾")
 
 
 async def on_shutdown(_):
     """Displays message to let users know bot is offline"""
+    release_leases()
     await send_message(
         channel_id=TELEGRAM_CHAT_ID, message="Going offline! Be right back."
     )
@@ -45,6 +49,7 @@ if __name__ == "__main__":
 
     executor = executor.Executor(dispatcher=dp, skip_updates=True)
     executor.set_web_app(application=app)
+    setup_routes(app)
     app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
 
@@ -0,0 +1,17 @@
+from aiohttp import web
+
+from services.metrics import render
+
+
+async def send_metrics(_request: web.Request) -> web.Response:
+    """Exposes bot metrics for scraping"""
+    return web.Response(text=render(), content_type="text/plain")
+
+
+def setup_routes(app: web.Application) -> None:
+    """Registers metrics route
+
+    Args:
+        app (web.Application): Web application
+    """
+    app.router.add_get("/metrics", send_metrics)
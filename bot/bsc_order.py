@@ -1,36 +1,287 @@
 import asyncio
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from typing import Coroutine, Dict, List, Set, Tuple
+
+from requests.exceptions import RequestException
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
 
 from api.bsc import PancakeSwap
-from config import BUY, SELL, STOP, TELEGRAM_CHAT_ID
+from app import logger
+from config import (
+    BUY,
+    ORDER_CLAIM_TTL,
+    ORDER_MAX_ATTEMPTS,
+    SELL,
+    SHARD_COUNT,
+    TELEGRAM_CHAT_ID,
+    WORKER_ID,
+)
 from handlers.base import send_message
 from models import Order
 from schemas import LimitOrder
+from services.partition import owns
+
+monitors: Dict[str, "TokenPriceMonitor"] = {}
+order_tokens: Dict[int, str] = {}
+
+# Monitors & order executions, referenced so they aren't garbage collected before completing
+order_tasks: Set[asyncio.Task] = set()
+
+# Owned shards when orders were last rehydrated & newest order seen since, later rehydrations only load newer orders
+rehydrated_shards: Set[int] = set()
+last_order_id = 0
+
+# Seconds before an order whose swap couldn't be sent is retried, multiplied by its failed attempts
+ORDER_RETRY_DELAY = 30
+
+# PancakeSwap wrapper per wallet address, shared by every order of the wallet
+dexes: Dict[str, PancakeSwap] = {}
+
+
+def run_order_task(coroutine: Coroutine) -> None:
+    """
+    Runs coroutine in the background, keeping a reference until it completes
+    Args:
+        coroutine (Coroutine): Price monitor or order execution
+
+    """
+    task = asyncio.create_task(coroutine)
+    order_tasks.add(task)
+    task.add_done_callback(order_tasks.discard)
+
+
+def get_dex(order: LimitOrder) -> PancakeSwap:
+    """
+    Retrieves the PancakeSwap wrapper of the wallet executing order
+    Args:
+        order (LimitOrder): Limit order
+
+    Returns (PancakeSwap): PancakeSwap wrapper API
+
+    """
+    bsc = order.telegram_group_member.bsc  # type: ignore
+
+    if bsc.address not in dexes:
+        dexes[bsc.address] = PancakeSwap(address=bsc.address, key=bsc.private_key)
+    return dexes[bsc.address]
+
+
+class TokenPriceMonitor:
+    """Fetches a token price once per block and dispatches it to every limit order waiting on that token"""
+
+    def __init__(self, token: str, dex: PancakeSwap):
+        self.token = token
+        self.dex = dex
+        self.orders: Dict[int, LimitOrder] = {}
+
+        # Sorted (target price, order id) thresholds. Orders in 'below' trigger when price drops to their target
+        # (BUY & STOP), orders in 'above' trigger when price rises to their target (SELL)
+        self.below: List[Tuple[Decimal, int]] = []
+        self.above: List[Tuple[Decimal, int]] = []
+
+    def _thresholds(self, order: LimitOrder) -> List[Tuple[Decimal, int]]:
+        return self.above if order.trade_direction == SELL else self.below
+
+    def add(self, order: LimitOrder) -> None:
+        """
+        Starts monitoring limit order
+        Args:
+            order (LimitOrder): Limit order
+
+        """
+        self.orders[order.id] = order  # type: ignore
+        insort(self._thresholds(order), (order.target_price, order.id))
+
+    def remove(self, order_id: int) -> None:
+        """
+        Stops monitoring limit order
+        Args:
+            order_id (int): Order id
+
+        """
+        order = self.orders.pop(order_id, None)
+
+        if order:
+            thresholds = self._thresholds(order)
+            entry = (order.target_price, order_id)
+            index = bisect_left(thresholds, entry)
+
+            if index < len(thresholds) and thresholds[index] == entry:
+                del thresholds[index]
+
+    def pop_triggered(self, price: Decimal) -> List[LimitOrder]:
+        """
+        Removes and returns all orders triggered by the given price
+        Args:
+            price (Decimal): Current token price
 
+        Returns (list): Triggered limit orders
 
-async def limit_order_executor(order: LimitOrder):
-    order_executed = False
-    user = order.telegram_group_member
-    bsc = user.bsc  # type: ignore
-    dex = PancakeSwap(address=bsc.address, key=bsc.private_key)  # type: ignore
-    token = dex.get_token(address=order.address)
-    target_price = order.target_price
-    trade_direction = order.trade_direction
-    reply = "Limit order executed\n"
-    while not order_executed:
-        token_price = dex.get_token_price(token=order.address, decimals=token.decimals)
-
-        if trade_direction == BUY and token_price <= target_price:
-            reply += dex.swap_tokens(
-                token=order.address, amount_to_spend=order.bnb_amount, side=BUY
-            )
-            order_executed = True
-        elif (trade_direction == SELL and token_price >= target_price) or (
-            trade_direction == STOP and token_price <= target_price
-        ):
-            reply += dex.swap_tokens(
-                token=order.address, amount_to_spend=order.bnb_amount, side=SELL
-            )
-            order_executed = True
-        await asyncio.sleep(2)
-    Order.get_or_none(primary_key=order.id).remove()  # type: ignore
+        """
+        below_index = bisect_left(self.below, (price,))
+        above_index = bisect_right(self.above, (price, float("inf")))
+        triggered = self.below[below_index:] + self.above[:above_index]
+        del self.below[below_index:]
+        del self.above[:above_index]
+        return [self.orders.pop(order_id) for _, order_id in triggered]
+
+    def drop_foreign_orders(self) -> None:
+        """Stops monitoring orders that moved to a shard owned by another replica"""
+        for order_id in [order_id for order_id in self.orders if not owns(order_id)]:
+            logger.info("Order %d is now handled by another replica", order_id)
+            self.remove(order_id=order_id)
+            order_tokens.pop(order_id, None)
+
+    async def run(self) -> None:
+        """Repetitive task that monitors token price until there are no more orders waiting on it"""
+        logger.info("Started price monitor for %s", self.token)
+        try:
+            token = await self.dex.get_token(address=self.token)
+
+            # Price is checked exactly once per new block
+            async for _ in self.dex.get_block_watcher().blocks():
+                if not self.orders:
+                    break
+                self.drop_foreign_orders()
+                try:
+                    token_price = await self.dex.get_token_price(
+                        token=self.token, decimals=token.decimals
+                    )
+                except (
+                    BadFunctionCallOutput,
+                    ContractLogicError,
+                    RequestException,
+                    ValueError,
+                ) as e:
+                    # Price is fetched again on next block, e.g. once liquidity returns or the node recovers
+                    logger.exception(e)
+                    continue
+
+                for order in self.pop_triggered(price=token_price):
+                    order_tokens.pop(order.id, None)  # type: ignore
+                    side = BUY if order.trade_direction == BUY else SELL
+                    run_order_task(limit_order_executor(order=order, side=side))
+        finally:
+            for order_id in self.orders:
+                order_tokens.pop(order_id, None)
+            monitors.pop(self.token, None)
+            logger.info("Stopped price monitor for %s", self.token)
+
+
+async def limit_order_executor(order: LimitOrder, side: str) -> None:
+    """
+    Executes triggered limit order. Once its swap is broadcast the order is deleted, so it is never swapped twice.
+    Orders whose swap couldn't be sent are retried with backoff & cancelled after ORDER_MAX_ATTEMPTS
+    Args:
+        order (LimitOrder): Limit order
+        side (str): Swap side
+
+    """
+    # Order was cancelled or is being executed by another replica
+    if not Order.claim(
+        primary_key=order.id, owner=WORKER_ID, ttl=ORDER_CLAIM_TTL  # type: ignore
+    ):
+        return
+    dex = get_dex(order=order)
+
+    # Unexpected errors leave the claim to expire, the order is then picked up again by rehydration
+    try:
+        txn_hash = await dex.broadcast_swap(
+            token=order.address,  # type: ignore
+            amount_to_spend=order.bnb_amount,  # type: ignore
+            side=side,
+            chat_id=TELEGRAM_CHAT_ID,
+        )
+    except (RequestException, ValueError) as e:
+        logger.exception(e)
+        attempts = Order.release_claim(primary_key=order.id, owner=WORKER_ID)  # type: ignore
+
+        if attempts < ORDER_MAX_ATTEMPTS:
+            await asyncio.sleep(ORDER_RETRY_DELAY * attempts)
+            schedule_order(order=order)
+            return
+        reply = f"Limit order cancelled after {attempts} failed attempts\n{e}"
+    else:
+        reply = f"Limit order executed\n{dex.get_swap_reply(txn_hash=txn_hash)}"
+    finished = Order.get_or_none(primary_key=order.id)  # type: ignore
+
+    if finished:
+        finished.remove()
     await send_message(channel_id=TELEGRAM_CHAT_ID, message=reply)
+
+
+def schedule_order(order: LimitOrder) -> None:
+    """
+    Adds order to the price monitor of its token if order belongs to a shard owned by this replica
+    Args:
+        order (LimitOrder): Limit order
+
+    """
+    if order.id in order_tokens or not owns(order.id):  # type: ignore
+        return
+    token = order.address
+    monitor = monitors.get(token)  # type: ignore
+
+    if monitor is None:
+        monitor = TokenPriceMonitor(token=token, dex=get_dex(order=order))  # type: ignore
+        monitors[token] = monitor  # type: ignore
+        run_order_task(monitor.run())
+    monitor.add(order=order)
+    order_tokens[order.id] = token  # type: ignore
+
+
+def cancel_order(order_id: int) -> None:
+    """
+    Stops monitoring cancelled order
+    Args:
+        order_id (int): Order id
+
+    """
+    token = order_tokens.pop(order_id, None)
+
+    if token in monitors:
+        monitors[token].remove(order_id=order_id)
+
+
+async def rehydrate_orders(shards: Set[int]) -> None:
+    """
+    Schedules orders in owned shards, including orders created on peer replicas or taken over from dead replicas.
+    Every order of the shards is loaded only when owned shards change, other renewals only load orders created since
+    & orders whose claim was abandoned. Metadata of every new token is fetched in one multicall before monitors start,
+    so a boot with thousands of orders starts one monitor per token instead of a burst of RPC calls per order
+    Args:
+        shards (set): Shards owned by this replica
+
+    """
+    global last_order_id
+
+    reload = shards != rehydrated_shards
+    orders = [
+        LimitOrder.from_orm(order)
+        for order in Order.unclaimed(
+            shards=sorted(shards),
+            shard_count=SHARD_COUNT,
+            ttl=ORDER_CLAIM_TTL,
+            after_id=0 if reload else last_order_id,
+        )
+    ]
+    rehydrated_shards.clear()
+    rehydrated_shards.update(shards)
+    last_order_id = max([last_order_id, *(order.id for order in orders)])  # type: ignore
+    orders = [order for order in orders if order.id not in order_tokens]
+
+    if not orders:
+        return
+    new_tokens = {order.address for order in orders if order.address not in monitors}
+
+    if new_tokens:
+        try:
+            await get_dex(order=orders[0]).get_tokens(addresses=list(new_tokens))
+        except (RequestException, ValueError) as e:
+            # Monitors fetch metadata of their own token instead
+            logger.exception(e)
+    logger.info("Scheduling %d orders on %d new tokens", len(orders), len(new_tokens))
+
+    for order in orders:
+        schedule_order(order=order)
@@ -1,17 +1,45 @@
 import asyncio
+import time
 from decimal import Decimal
-from typing import Union
+from typing import Dict, List, Optional, Set, Union
 
-from web3.exceptions import BadFunctionCallOutput
+from pydantic import BaseModel
+from requests.exceptions import RequestException
+from web3 import Web3
 from web3.types import Address, ChecksumAddress
 
-from api.bsc import PancakeSwap
+from api.bsc import PancakeSwap, CONTRACT_ADDRESSES
+from api.rpc import run_sync
 from app import logger
 from config import BUY
 from handlers.base import send_message
+from services.metrics import observe
 
+PAIR_CREATED_TOPIC = Web3.toHex(
+    Web3.keccak(text="PairCreated(address,address,address,uint256)")
+)
+MINT_TOPIC = Web3.toHex(Web3.keccak(text="Mint(address,uint256,uint256)"))
+# Most nodes reject log queries spanning more blocks
+SNIPER_MAX_BLOCK_RANGE = 1000
 
-def token_has_liquidity(token, pancake_swap) -> bool:
+# Snipes being added or bought, referenced so they aren't garbage collected before completing
+snipe_tasks: Set[asyncio.Task] = set()
+
+
+class Snipe(BaseModel):
+    chat_id: int
+    token: str
+    amount: Decimal
+    pancake_swap: PancakeSwap
+    raw_transaction: Optional[bytes] = None
+    nonce: Optional[int] = None
+    deadline: int = 0
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+async def token_has_liquidity(token, pancake_swap) -> bool:
     """
     Verifies if token has liquidity
     Args:
@@ -22,16 +50,270 @@ def token_has_liquidity(token, pancake_swap) -> bool:
 
     """
     logger.info("Verifying %s has liquidity", token)
-    has_liquidity = False
-    try:
-        pair_address = pancake_swap.get_token_pair_address(token=token)
-        abi = pancake_swap.get_contract_abi(abi_type="liquidity")
-        contract = pancake_swap.web3.eth.contract(address=pair_address, abi=abi)
-        liquidity_reserves = contract.functions.getReserves().call()
-        has_liquidity = max(liquidity_reserves[:2]) > 0
-    except BadFunctionCallOutput:
-        logger.exception("Supported LP does not exist for this token.")
-    return has_liquidity
+    pair_address = pancake_swap.get_token_pair_address(
+        token_0=token, token_1=CONTRACT_ADDRESSES["WBNB"]
+    )
+    reserves = (await pancake_swap.get_pairs_reserves(pairs=[pair_address]))[
+        pair_address
+    ]
+
+    if reserves is None:
+        logger.info("Supported LP does not exist for this token.")
+        return False
+    return max(reserves) > 0
+
+
+class SniperEngine:
+    """
+    Watches factory PairCreated & pair Mint logs for every sniped token with a single log query per block and buys
+    in the same block liquidity is added
+    """
+
+    def __init__(self, pancake_swap: PancakeSwap):
+        self.pancake_swap = pancake_swap
+        self.snipes: Dict[str, List[Snipe]] = {}
+        self.pairs: Dict[str, str] = {}
+        self.last_block = 0
+        self.task: Optional[asyncio.Task] = None
+
+    async def add(self, snipe: Snipe) -> None:
+        """
+        Starts watching token liquidity for snipe. Buys right away if token already has liquidity
+        Args:
+            snipe (Snipe): Snipe to execute once liquidity is added
+
+        """
+        token = snipe.token
+
+        has_liquidity: Optional[bool] = None
+        try:
+            has_liquidity = await token_has_liquidity(
+                token=token, pancake_swap=self.pancake_swap
+            )
+        except (RequestException, ValueError) as e:
+            # Liquidity added from now on is still caught from the pair's Mint logs
+            logger.exception(e)
+
+        if has_liquidity:
+            self.execute(snipe=snipe, triggered_at=time.perf_counter())
+            return
+        await self.prepare(snipe=snipe)
+        self.snipes.setdefault(token, []).append(snipe)  # type: ignore
+
+        # Pair address is known before the pair is created, so its Mint is caught even without PairCreated
+        pair_address = self.pancake_swap.get_token_pair_address(
+            token_0=token, token_1=CONTRACT_ADDRESSES["WBNB"]
+        )
+        self.pairs[pair_address] = token  # type: ignore
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+        if has_liquidity is None:
+            await send_message(
+                channel_id=snipe.chat_id,
+                message=f"⚠ Unable to verify liquidity of {token}. It will be sniped once liquidity is added",
+            )
+
+    @staticmethod
+    async def prepare(snipe: Snipe) -> None:
+        """
+        Signs snipe buy ahead of time. When it can't be signed, snipe falls back to building the swap once liquidity
+        is detected
+        Args:
+            snipe (Snipe): Snipe to prepare
+
+        """
+        try:
+            prepared = await snipe.pancake_swap.prepare_snipe(
+                token=snipe.token, amount_to_spend=snipe.amount
+            )
+            snipe.raw_transaction, snipe.nonce, snipe.deadline = prepared
+        except (RequestException, ValueError) as e:
+            logger.exception(e)
+            snipe.raw_transaction = snipe.nonce = None
+
+    async def refresh_prepared(self) -> None:
+        """Signs prepared transactions again once their nonce was used by another transaction or their deadline passed"""
+        now = time.time()
+
+        for snipes in self.snipes.values():
+            for snipe in snipes:
+                if snipe.raw_transaction is None:
+                    continue
+                try:
+                    nonce = await snipe.pancake_swap.get_nonce_manager().peek()
+                except (RequestException, ValueError) as e:
+                    logger.exception(e)
+                    continue
+                if snipe.nonce != nonce or now >= snipe.deadline:
+                    await self.prepare(snipe=snipe)
+
+    @staticmethod
+    def execute(snipe: Snipe, triggered_at: float) -> None:
+        """
+        Buys sniped token, broadcasting the pre-signed transaction when available
+        Args:
+            snipe (Snipe): Snipe to execute
+            triggered_at (float): Performance counter value when liquidity was detected
+
+        """
+        token = snipe.token
+        reply = f"Sniped token 🎯.\n\nView token here: https://poocoin.app/tokens/{token}\n\n"  # type: ignore
+
+        async def snipe_token():
+            if snipe.raw_transaction and time.time() < snipe.deadline:
+                try:
+                    swap_reply = await snipe.pancake_swap.send_prepared_transaction(
+                        raw_transaction=snipe.raw_transaction,
+                        nonce=snipe.nonce,  # type: ignore
+                        chat_id=snipe.chat_id,
+                    )
+                    observe(
+                        name="snipe_trigger_to_broadcast_seconds",
+                        value=time.perf_counter() - triggered_at,
+                    )
+                    await send_message(
+                        channel_id=snipe.chat_id, message=reply + swap_reply
+                    )
+                    return
+                except (RequestException, ValueError) as e:
+                    # Pre-signed transaction went stale, e.g. wallet nonce moved on
+                    logger.exception(e)
+                    snipe.raw_transaction = snipe.nonce = None
+            swap_reply = await snipe.pancake_swap.swap_tokens(
+                token=token,
+                amount_to_spend=snipe.amount,
+                side=BUY,
+                is_snipe=True,
+                chat_id=snipe.chat_id,
+            )
+            await send_message(channel_id=snipe.chat_id, message=reply + swap_reply)
+
+        task = asyncio.create_task(snipe_token())
+        snipe_tasks.add(task)
+        task.add_done_callback(snipe_tasks.discard)
+
+    def fire(self, token: str) -> None:
+        """
+        Executes all snipes of token
+        Args:
+            token (str): Token that just received liquidity
+
+        """
+        triggered_at = time.perf_counter()
+        logger.info("Liquidity added for %s", token)
+        self.pairs = {
+            pair: _token for pair, _token in self.pairs.items() if _token != token
+        }
+
+        for snipe in self.snipes.pop(token, []):
+            self.execute(snipe=snipe, triggered_at=triggered_at)
+
+    async def get_logs(
+        self, from_block: int, to_block: int, addresses: list, topics: list
+    ) -> list:
+        return await run_sync(
+            self.pancake_swap.web3.eth.get_logs,
+            {
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "address": addresses,
+                "topics": [topics],
+            },
+        )
+
+    def handle_pair_created(self, log) -> Optional[str]:
+        """
+        Starts watching newly created WBNB pair of a sniped token
+        Args:
+            log: PairCreated log
+
+        Returns (Optional[str]): Pair address if it belongs to a sniped token
+
+        """
+        token_0, token_1 = (
+            Web3.toChecksumAddress(Web3.toHex(topic[-20:]))
+            for topic in log["topics"][1:3]
+        )
+        wbnb = CONTRACT_ADDRESSES["WBNB"]
+        token = token_1 if token_0 == wbnb else token_0 if token_1 == wbnb else None
+
+        if token not in self.snipes:
+            return None
+        pair_address = Web3.toChecksumAddress(f"0x{log['data'][26:66]}")
+        logger.info("Pair %s created for %s", pair_address, token)
+        self.pairs[pair_address] = token  # type: ignore
+        return pair_address
+
+    async def process_blocks(self, from_block: int, to_block: int) -> None:
+        """
+        Fires snipes whose liquidity was added within block range
+        Args:
+            from_block (int): First block of range
+            to_block (int): Last block of range
+
+        """
+        logs = await self.get_logs(
+            from_block=from_block,
+            to_block=to_block,
+            addresses=[self.pancake_swap.factory_address, *self.pairs],
+            topics=[PAIR_CREATED_TOPIC, MINT_TOPIC],
+        )
+        new_pairs = []
+
+        for log in logs:
+            topic = Web3.toHex(log["topics"][0])
+
+            if topic == PAIR_CREATED_TOPIC:
+                pair_address = self.handle_pair_created(log=log)
+
+                if pair_address:
+                    new_pairs.append(pair_address)
+            elif topic == MINT_TOPIC and log["address"] in self.pairs:
+                self.fire(token=self.pairs[log["address"]])
+
+        # Pair creation & first liquidity usually land in the same block
+        if new_pairs:
+            for log in await self.get_logs(
+                from_block=from_block,
+                to_block=to_block,
+                addresses=new_pairs,
+                topics=[MINT_TOPIC],
+            ):
+                if log["address"] in self.pairs:
+                    self.fire(token=self.pairs[log["address"]])
+
+    async def run(self) -> None:
+        """Processes PairCreated & Mint logs of every new block while there are active snipes"""
+        async for block_number in self.pancake_swap.get_block_watcher().blocks():
+            if not self.snipes:
+                break
+            if not self.last_block:
+                self.last_block = block_number - 1
+            from_block = self.last_block + 1
+            try:
+                # Blocks missed during an outage are queried in chunks the node accepts
+                for chunk_start in range(
+                    from_block, block_number + 1, SNIPER_MAX_BLOCK_RANGE
+                ):
+                    chunk_end = min(
+                        chunk_start + SNIPER_MAX_BLOCK_RANGE - 1, block_number
+                    )
+                    await self.process_blocks(
+                        from_block=chunk_start, to_block=chunk_end
+                    )
+                    self.last_block = chunk_end
+            except (RequestException, ValueError) as e:
+                # Unprocessed blocks are queried again along with the next block
+                logger.exception(e)
+
+            # Signed after the block is processed so re-signing never delays a snipe
+            await self.refresh_prepared()
+        self.last_block = 0
+
+
+sniper_engine: Optional[SniperEngine] = None
 
 
 async def pancake_swap_sniper(
@@ -48,14 +330,15 @@ async def pancake_swap_sniper(
         amount: Amount of BNB to spend to buy token
         pancake_swap: PancakeSwap wrapper API
     """
-    has_liquidity = False
-    while not has_liquidity:
-        has_liquidity = token_has_liquidity(token, pancake_swap)
+    global sniper_engine
 
-        if has_liquidity:
-            reply = f"Sniped token 🎯.\n\nView token here: https://poocoin.app/tokens/{token}\n\n"  # type: ignore
-            reply += pancake_swap.swap_tokens(
-                token=token, amount_to_spend=amount, side=BUY, is_snipe=True
-            )
-            await send_message(channel_id=chat_id, message=reply)
-        await asyncio.sleep(2)
+    if sniper_engine is None:
+        sniper_engine = SniperEngine(pancake_swap=pancake_swap)
+    await sniper_engine.add(
+        snipe=Snipe(
+            chat_id=chat_id,
+            token=token,  # type: ignore
+            amount=amount,
+            pancake_swap=pancake_swap,
+        )
+    )
@@ -1,4 +1,5 @@
 import os
+import socket
 from enum import Enum
 
 from dotenv import load_dotenv
@@ -35,16 +36,29 @@ GREETINGS = [
 
 # Binance Smart Chain settings
 BSCSCAN_API_KEY = os.getenv("BSCSCAN_API_KEY")
+BINANCE_SMART_CHAIN_URLS = os.getenv(
+    "BINANCE_SMART_CHAIN_URLS",
+    "https://bsc-dataseed.binance.org/,https://bsc-dataseed1.defibit.io/,https://bsc-dataseed1.ninicoin.io/",
+).split(",")
+BINANCE_SMART_CHAIN_WS_URL = os.getenv("BINANCE_SMART_CHAIN_WS_URL")
 BUY = "BUY"
 SELL = "SELL"
 STOP = "STOP"
 
 # Ethereum Main Net settings
 ETHEREUM_MAIN_NET_URL = os.getenv("ETHEREUM_MAIN_NET_URL")
+ETHEREUM_MAIN_NET_URLS = os.getenv(
+    "ETHEREUM_MAIN_NET_URLS", ETHEREUM_MAIN_NET_URL or ""
+).split(",")
+ETHEREUM_MAIN_NET_WS_URL = os.getenv("ETHEREUM_MAIN_NET_WS_URL")
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 
 # Polygon settings
 POLYGONSCAN_API_KEY = os.getenv("POLYGONSCAN_API_KEY")
+MATIC_CHAIN_URLS = os.getenv(
+    "MATIC_CHAIN_URLS", "https://polygon-rpc.com,https://rpc-mainnet.maticvigil.com"
+).split(",")
+MATIC_CHAIN_WS_URL = os.getenv("MATIC_CHAIN_WS_URL")
 
 # Telegram env settings
 TELEGRAM_BOT_API_KEY = os.getenv("TELEGRAM_BOT_API_KEY")
@@ -100,5 +114,25 @@ KUCOIN_API_PASSPHRASE = os.getenv("KUCOIN_API_PASSPHRASE")
 TELEGRAM_CHAT_ID = int(os.getenv("TELEGRAM_CHAT_ID"))  # type: ignore
 KUCOIN_TASK_NAME = "KUCOIN_BOT"
 
+# Largest holdings shown by /spy
+SPY_TOP_HOLDINGS = 5
+
+# Replica partitioning settings
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "16"))
+SHARD_LEASE_TTL = int(os.getenv("SHARD_LEASE_TTL", "30"))
+ORDER_CLAIM_TTL = int(os.getenv("ORDER_CLAIM_TTL", "300"))
+ORDER_MAX_ATTEMPTS = int(os.getenv("ORDER_MAX_ATTEMPTS", "3"))
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+
+# Chain RPC settings
+RPC_MAX_WORKERS = int(os.getenv("RPC_MAX_WORKERS", "32"))
+RPC_TIMEOUT = int(os.getenv("RPC_TIMEOUT", "30"))
+RPC_HEALTH_CHECK_INTERVAL = int(os.getenv("RPC_HEALTH_CHECK_INTERVAL", "15"))
+RPC_MAX_BLOCK_LAG = int(os.getenv("RPC_MAX_BLOCK_LAG", "5"))
+RPC_MAX_BATCH_SIZE = int(os.getenv("RPC_MAX_BATCH_SIZE", "50"))
+
+# Gas price settings
+GAS_ORACLE_INTERVAL = int(os.getenv("GAS_ORACLE_INTERVAL", "15"))
+
 # CoinMarketCap settings
 COIN_MARKET_CAP_API_KEY = os.getenv("COIN_MARKET_CAP_API_KEY")
@@ -1,10 +1,11 @@
 import asyncio
+import heapq
 import random
 import time
 from decimal import Decimal
 from io import BufferedReader, BytesIO
 from itertools import chain
-from typing import Dict
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse
 
 import aiohttp
@@ -30,7 +31,6 @@ from pandas import DataFrame, read_html, to_datetime
 from pydantic.error_wrappers import ValidationError
 from requests.exceptions import RequestException, HTTPError
 from web3 import Web3
-from web3.exceptions import ContractLogicError
 
 from api.bsc import PancakeSwap
 from api.coinbase import CoinBaseApi
@@ -43,10 +43,18 @@ from api.kucoin import KucoinApi
 from api.matic import QuickSwap
 from app import bot, logger, chart_cb, alert_cb, price_cb
 from bot import active_orders
-from bot.bsc_order import limit_order_executor
-from bot.bsc_sniper import pancake_swap_sniper
+from bot.bsc_order import schedule_order, cancel_order
+from bot.bsc_sniper import pancake_swap_sniper, snipe_tasks
 from bot.kucoin_bot import kucoin_bot
-from config import BUY, FERNET_KEY, HEADERS, KUCOIN_TASK_NAME, SELL, TELEGRAM_CHAT_ID
+from config import (
+    BUY,
+    FERNET_KEY,
+    HEADERS,
+    KUCOIN_TASK_NAME,
+    SELL,
+    SPY_TOP_HOLDINGS,
+    TELEGRAM_CHAT_ID,
+)
 from handlers.base import send_message, send_photo, is_admin_user
 from models import CryptoAlert, TelegramGroupMember, Order, MonthlySubmission
 from schemas import (
@@ -61,8 +69,8 @@ from schemas import (
     CoinbaseOrder,
     TokenSubmission,
 )
+from services.gas_oracle import NETWORK_URLS, gas_oracle
 from utils import all_same
-from . import gas_tracker
 
 
 def get_coin_explorers(platforms: dict, links: dict) -> list:
@@ -333,20 +341,27 @@ async def send_price(message: Message) -> None:
 
 
 async def send_gas(message: Message) -> None:
-    """Replies to command with eth gas fees
+    """Replies to command with gas fees of every chain
 
     Args:
         message (Message): Message to reply to
     """
-    logger.info("ETH gas price command executed")
-    gas_price = await gas_tracker.get_gasprices()
-    reply = (
-        "ETH Gas Prices ⛽️\n"
-        f"Slow: {Web3.fromWei(gas_price['regular'], 'gwei')}\n"
-        f"Average: {Web3.fromWei(gas_price['fast'], 'gwei')}\n"
-        f"Fast: {Web3.fromWei(gas_price['fastest'], 'gwei')}\n"
-    )
-    await message.reply(text=reply)
+    logger.info("Gas price command executed")
+    reply = ""
+
+    for network in NETWORK_URLS:
+        try:
+            gas_prices = await gas_oracle.get_gas_prices(network=network)
+        except (RequestException, ValueError) as error:
+            logger.exception(error)
+            continue
+        reply += (
+            f"{network} Gas Prices ⛽️\n"
+            f"Slow: {Web3.fromWei(gas_prices.gas_price(speed='slow'), 'gwei')}\n"
+            f"Average: {Web3.fromWei(gas_prices.gas_price(speed='average'), 'gwei')}\n"
+            f"Fast: {Web3.fromWei(gas_prices.gas_price(speed='fastest'), 'gwei')}\n\n"
+        )
+    await message.reply(text=reply or "⚠ Gas prices are unavailable. Try again later.")
 
 
 async def send_price_address(message: Message) -> None:
@@ -370,8 +385,12 @@ async def send_price_address(message: Message) -> None:
             pancake_swap = PancakeSwap(
                 address=user.bsc.address, key=user.bsc.private_key  # type: ignore
             )
-            token = pancake_swap.get_token(address=address)
-            price = "${:,}".format(1 / pancake_swap.get_token_price(token=address))
+            token = await pancake_swap.get_token(address=address)
+            price = "${:,}".format(
+                await pancake_swap.get_token_price(
+                    token=address, decimals=token.decimals
+                )
+            )
             coin_stats = {"token_name": token.name, "price": price}
         else:
 
@@ -656,8 +675,11 @@ async def send_buy(message: Message) -> None:
             else:
                 dex = QuickSwap(address=user.matic.address, key=user.matic.private_key)  # type: ignore
 
-            reply = dex.swap_tokens(
-                token=trade.address, amount_to_spend=trade.amount, side=trade.side
+            reply = await dex.swap_tokens(
+                token=trade.address,
+                amount_to_spend=trade.amount,
+                side=trade.side,
+                chat_id=message.chat.id,
             )
         else:
             reply = "⚠ Sorry, you must register prior to using this command."
@@ -702,7 +724,10 @@ async def send_sell(message: Message) -> None:
                 dex = QuickSwap(address=user.matic.address, key=user.matic.private_key)  # type: ignore
 
             reply = await dex.swap_tokens(
-                token=trade.address, amount_to_spend=trade.amount, side=trade.side
+                token=trade.address,
+                amount_to_spend=trade.amount,
+                side=trade.side,
+                chat_id=message.chat.id,
             )
         else:
             reply = "⚠ Sorry, you must register prior to using this command."
@@ -1221,11 +1246,17 @@ async def send_balance(message: Message):
 
 
 async def send_spy(message: Message):
+    """Replies to command with the largest holdings of given wallet address
+
+    Args:
+        message (Message): Message to reply to
+    """
     logger.info("Executing spy command")
-    counter = 0
     user_id = message.from_user.id
     user = User.from_orm(TelegramGroupMember.get_or_none(primary_key=user_id))
-    account_data_frame = DataFrame()
+
+    # Min heap of the largest holdings seen so far, smallest USD value on top
+    top_holdings: List[Tuple[Decimal, int, dict]] = []
     try:
         network, address = message.get_args().split()
         coin = Coin(address=address, network=network)
@@ -1236,41 +1267,29 @@ async def send_spy(message: Message):
             dex = UniSwap(address=user.eth.address, key=user.eth.private_key)  # type: ignore
         else:
             dex = QuickSwap(address=user.matic.address, key=user.matic.private_key)  # type: ignore
-        account_holdings = await dex.get_account_token_holdings(address=coin.address)
-
-        for k in account_holdings.keys():
-            if counter > 5:
-                break
-            _coin = account_holdings[k]
-            token = _coin["address"]
-
-            # Quantity in wei used to calculate price
-            quantity = dex.get_token_balance(address=coin.address, token=token)
-            if quantity > 0:
-                try:
-                    token_price = dex.get_token_price(token=token)
-                    price = quantity / token_price
-
-                    # Quantity in correct format as seen in wallet
-                    quantity = dex.get_decimal_representation(
-                        quantity=quantity, decimals=_coin["decimals"]
-                    )
-                    usd_amount = price.quantize(Decimal("0.01"))
-                    data_frame = DataFrame(
-                        {"Symbol": [k], "Balance": [quantity], "USD": [usd_amount]}
-                    )
-                    account_data_frame = account_data_frame.append(
-                        data_frame, ignore_index=True
-                    )
-                    counter += 1
-                except ContractLogicError as error:
-                    logger.exception(error)
 
-    except (IndexError, ValidationError) as error:
+        # Index breaks ties so holdings of equal value are never compared
+        index = 0
+
+        async for holding in dex.iter_account_token_holdings(address=coin.address):
+            entry = (holding["USD"], index, holding)
+            index += 1
+
+            if len(top_holdings) < SPY_TOP_HOLDINGS:
+                heapq.heappush(top_holdings, entry)
+            elif entry[0] > top_holdings[0][0]:
+                heapq.heapreplace(top_holdings, entry)
+    except (IndexError, RequestException, ValueError) as error:
         logger.exception(error)
-    account_data_frame.sort_values(by=["USD"], inplace=True, ascending=False)
-    account_data_frame["USD"] = account_data_frame["USD"].apply("${:,}".format)
-    fig = fif.create_table(account_data_frame)
+
+    if not top_holdings:
+        await message.reply(text="⚠️ No holdings found. Usage: /spy NETWORK ADDRESS")
+        return
+    holdings = [
+        {**holding, "USD": "${:,}".format(holding["USD"])}
+        for _, _, holding in sorted(top_holdings, reverse=True)
+    ]
+    fig = fif.create_table(DataFrame(holdings))
     fig.update_layout(
         autosize=True,
     )
@@ -1293,7 +1312,7 @@ async def send_snipe(message: Message):
     user = User.from_orm(TelegramGroupMember.get_or_none(primary_key=user_id))
 
     pancake_swap = PancakeSwap(address=user.bsc.address, key=user.bsc.private_key)  # type: ignore
-    asyncio.create_task(
+    task = asyncio.create_task(
         pancake_swap_sniper(
             chat_id=message.chat.id,
             token=trade.address,  # type: ignore
@@ -1301,6 +1320,8 @@ async def send_snipe(message: Message):
             pancake_swap=pancake_swap,
         )
     )
+    snipe_tasks.add(task)
+    task.add_done_callback(snipe_tasks.discard)
     await message.reply(
         text=f"🎯 Sniping {trade.address}...", parse_mode=ParseMode.MARKDOWN  # type: ignore
     )
@@ -1326,7 +1347,9 @@ async def send_limit_swap(message: Message):
 
         order = Order.get_or_none(primary_key=Order.create(data=data).id)
         limit_order = LimitOrder.from_orm(order)
-        asyncio.create_task(limit_order_executor(order=order))
+
+        # Replica owning the order's shard picks it up on its next lease renewal
+        schedule_order(order=limit_order)
         reply = f"Created limit order for {address}"
     except ValueError as error:
         logger.exception(error)
@@ -1348,7 +1371,7 @@ async def send_active_orders(message: Message) -> None:
     dex = PancakeSwap(address=user.bsc.address, key=user.bsc.private_key)  # type: ignore
 
     for order in Order.get_orders_by_member_id(telegram_group_member_id=user_id):
-        token = dex.get_token(address=order.address)
+        token = await dex.get_token(address=order.address)
         _order = LimitOrder.from_orm(order).dict(exclude={"address"})
         _order["telegram_group_member"] = user_id
         _order["token"] = token.name
@@ -1385,6 +1408,7 @@ async def send_cancel_order(message: Message):
     if order.telegram_group_member.id == user_id:
         reply = f"Cancelled order {order_id}"
         order.remove()
+        cancel_order(order_id=order_id)
 
     await message.reply(text=reply, parse_mode=ParseMode.MARKDOWN)
 
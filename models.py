@@ -174,6 +174,25 @@ class CryptoAlert(db.Entity):  # type: ignore
     def remove(self) -> None:
         CryptoAlert[self.id].delete()  # type: ignore
 
+    @staticmethod
+    def claim(primary_key: int) -> bool:
+        """
+        Deletes triggered alert so that it is only sent once, even if it was removed or sent by another replica
+        meanwhile
+        Args:
+            primary_key (int): Alert id
+
+        Returns (bool): True if this call removed the alert
+
+        """
+        with orm.db_session:
+            alert = CryptoAlert.get_for_update(id=primary_key)
+
+            if alert is None:
+                return False
+            alert.delete()
+        return True
+
 
 class Order(db.Entity):  # type: ignore
     id = orm.PrimaryKey(int, auto=True)
@@ -238,10 +257,128 @@ class Order(db.Entity):  # type: ignore
                     .prefetch(TelegramGroupMember.matic)
             )
 
+    @staticmethod
+    def unclaimed(shards: list, shard_count: int, ttl: int, after_id: int = 0) -> list:
+        """
+        Retrieves orders of shards that no replica is executing, filtered by the database
+        Args:
+            shards (list): Shard numbers
+            shard_count (int): Total amount of shards
+            ttl (int): Seconds after which a claim is considered abandoned
+            after_id (int): When set, only orders created after this order & orders whose claim was abandoned
+
+        Returns (list): Orders
+
+        """
+        claimed_after = datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)
+
+        with orm.db_session:
+            query = orm.select(
+                order
+                for order in Order  # type: ignore
+                if order.id % shard_count in shards
+                and not orm.exists(
+                    claim
+                    for claim in OrderClaim  # type: ignore
+                    if claim.order_id == order.id
+                    and claim.owner != ""
+                    and claim.claimed_at > claimed_after
+                )
+                and (
+                    after_id == 0
+                    or order.id > after_id
+                    or orm.exists(
+                        claim
+                        for claim in OrderClaim  # type: ignore
+                        if claim.order_id == order.id and claim.owner != ""
+                    )
+                )
+            )
+            return list(
+                query.prefetch(TelegramGroupMember)
+                    .prefetch(TelegramGroupMember.bsc)
+                    .prefetch(TelegramGroupMember.eth)
+                    .prefetch(TelegramGroupMember.matic)
+            )
+
+    @staticmethod
+    def claim(primary_key: int, owner: str, ttl: int) -> bool:
+        """
+        Marks order as being executed so that only a single replica executes it. Claims left behind by a replica
+        that died mid-swap expire after ttl
+        Args:
+            primary_key (int): Order id
+            owner (str): Replica worker id
+            ttl (int): Seconds after which a claim is considered abandoned
+
+        Returns (bool): True if this call claimed the order
+
+        """
+        logger.info("Claiming order with id: %d", primary_key)
+        with orm.db_session:
+            # Locking the order serializes replicas racing to create its claim
+            if Order.get_for_update(id=primary_key) is None:
+                return False
+            claim = OrderClaim.get_for_update(order_id=primary_key)
+            claimed_at = datetime.datetime.utcnow()
+
+            if claim is None:
+                OrderClaim(order_id=primary_key, owner=owner, claimed_at=claimed_at)
+            elif claim.is_live(ttl=ttl):
+                return False
+            else:
+                claim.set(owner=owner, claimed_at=claimed_at)
+        return True
+
+    @staticmethod
+    def release_claim(primary_key: int, owner: str) -> int:
+        """
+        Releases claim of an order that failed to execute so it can be retried, counting the failed attempt
+        Args:
+            primary_key (int): Order id
+            owner (str): Replica worker id
+
+        Returns (int): Failed execution attempts of order
+
+        """
+        logger.info("Releasing claim on order with id: %d", primary_key)
+        with orm.db_session:
+            claim = OrderClaim.get_for_update(order_id=primary_key)
+
+            if claim is None or claim.owner != owner:
+                return 0
+            claim.set(owner="", claimed_at=None, attempts=claim.attempts + 1)
+            return claim.attempts
+
     @orm.db_session
     def remove(self) -> None:
         logger.info("Deleting order with id: %d", self.id)
         Order[self.id].delete()  # type: ignore
+        OrderClaim.select(lambda claim: claim.order_id == self.id).delete(bulk=True)  # type: ignore
+
+
+class OrderClaim(db.Entity):  # type: ignore
+    """Replica executing an order. Kept apart from Order so existing order tables need no migration"""
+
+    order_id = orm.PrimaryKey(int)
+    owner = orm.Optional(str)
+    claimed_at = orm.Optional(datetime.datetime)
+    attempts = orm.Required(int, default=0)
+
+    def is_live(self, ttl: int) -> bool:
+        """
+        Verifies order is being executed by a replica
+        Args:
+            ttl (int): Seconds after which a claim is considered abandoned
+
+        Returns (bool): True if claim is held & hasn't expired
+
+        """
+        return bool(self.owner) and (
+            self.claimed_at is not None
+            and self.claimed_at
+            > datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl)
+        )
 
 
 class CoinBase(db.Entity):  # type: ignore
@@ -282,3 +419,188 @@ class MonthlySubmission(db.Entity):  # type: ignore
     def create(data: dict) -> db.Entity:  # type: ignore
         with orm.db_session:
             return MonthlySubmission(**data)
+
+
+class BotReplica(db.Entity):  # type: ignore
+    id = orm.PrimaryKey(str)
+    expires_at = orm.Required(datetime.datetime)
+
+
+class ShardLease(db.Entity):  # type: ignore
+    id = orm.PrimaryKey(int)
+    owner = orm.Optional(str)
+    expires_at = orm.Optional(datetime.datetime)
+
+    @staticmethod
+    def acquire(owner: str, shard_count: int, ttl: int) -> set:
+        """
+        Renews replica heartbeat, renews owned leases and claims free or expired shards up to a fair share
+        Args:
+            owner (str): Replica worker id
+            shard_count (int): Total amount of shards
+            ttl (int): Lease duration in seconds
+
+        Returns (set): Shards leased by replica
+
+        """
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=ttl)
+
+        with orm.db_session:
+            replica = BotReplica.get_for_update(id=owner)
+
+            if replica:
+                replica.expires_at = expires_at
+            else:
+                BotReplica(id=owner, expires_at=expires_at)
+            live_replicas = orm.count(
+                replica for replica in BotReplica if replica.expires_at > now  # type: ignore
+            )
+            fair_share = -(-shard_count // max(live_replicas, 1))
+
+            leases = {
+                lease.id: lease
+                for lease in ShardLease.select(lambda lease: lease.id < shard_count)
+                .order_by(ShardLease.id)
+                .for_update()
+            }
+            for shard in range(shard_count):
+                if shard not in leases:
+                    leases[shard] = ShardLease(id=shard)
+
+            owned = [
+                shard for shard, lease in sorted(leases.items()) if lease.owner == owner
+            ]
+
+            # Hand extra shards back so newly started replicas can pick them up
+            for shard in owned[fair_share:]:
+                leases[shard].set(owner="", expires_at=None)
+            owned = owned[:fair_share]
+
+            for shard, lease in sorted(leases.items()):
+                if len(owned) >= fair_share:
+                    break
+                if shard not in owned and (
+                    not lease.owner
+                    or lease.expires_at is None
+                    or lease.expires_at <= now
+                ):
+                    owned.append(shard)
+
+            for shard in owned:
+                leases[shard].set(owner=owner, expires_at=expires_at)
+        return set(owned)
+
+    @staticmethod
+    def release(owner: str) -> None:
+        """
+        Releases all leases held by replica so peers can take over immediately
+        Args:
+            owner (str): Replica worker id
+
+        """
+        logger.info("Releasing shard leases held by %s", owner)
+        with orm.db_session:
+            for lease in ShardLease.select(lambda lease: lease.owner == owner):
+                lease.set(owner="", expires_at=None)
+            replica = BotReplica.get(id=owner)
+
+            if replica:
+                replica.delete()
+
+
+class TokenMetadata(db.Entity):  # type: ignore
+    network = orm.Required(str)
+    address = orm.Required(str)
+    name = orm.Optional(str)
+    symbol = orm.Optional(str)
+    decimals = orm.Required(int)
+    orm.PrimaryKey(network, address)
+
+    @staticmethod
+    def all() -> list:
+        with orm.db_session:
+            return list(TokenMetadata.select())
+
+    @staticmethod
+    def save(data: dict) -> None:
+        """
+        Stores token metadata unless another replica already stored it
+        Args:
+            data (dict): Token metadata
+
+        """
+        try:
+            with orm.db_session:
+                token = TokenMetadata.get(
+                    network=data["network"], address=data["address"]
+                )
+
+                if not token:
+                    TokenMetadata(**data)
+        except orm.TransactionIntegrityError as e:
+            logger.exception(e)
+
+    @staticmethod
+    def save_many(data: list) -> None:
+        """
+        Stores metadata of several tokens in one transaction. Falls back to storing tokens one by one if another
+        replica stored some of them meanwhile
+        Args:
+            data (list): Token metadata
+
+        """
+        try:
+            with orm.db_session:
+                for token_data in data:
+                    token = TokenMetadata.get(
+                        network=token_data["network"], address=token_data["address"]
+                    )
+
+                    if not token:
+                        TokenMetadata(**token_data)
+        except orm.TransactionIntegrityError:
+            for token_data in data:
+                TokenMetadata.save(data=token_data)
+
+
+class WalletTokenIndex(db.Entity):  # type: ignore
+    network = orm.Required(str)
+    address = orm.Required(str)
+    last_block = orm.Required(int, size=64, default=0)
+    tokens = orm.Required(orm.Json, default=dict)
+    orm.PrimaryKey(network, address)
+
+    @staticmethod
+    def get_or_none(network: str, address: str) -> db.Entity:  # type: ignore
+        with orm.db_session:
+            return WalletTokenIndex.get(network=network, address=address)
+
+    @staticmethod
+    def save(network: str, address: str, last_block: int, tokens: dict) -> None:
+        """
+        Stores tokens a wallet has transferred along with the last scanned block
+        Args:
+            network (str): Network name
+            address (str): Wallet address
+            last_block (int): Last block scanned for transfers
+            tokens (dict): Symbol & decimals per token contract address
+
+        """
+        try:
+            with orm.db_session:
+                index = WalletTokenIndex.get_for_update(
+                    network=network, address=address
+                )
+
+                if index is None:
+                    WalletTokenIndex(
+                        network=network,
+                        address=address,
+                        last_block=last_block,
+                        tokens=tokens,
+                    )
+                elif last_block >= index.last_block:
+                    index.set(last_block=last_block, tokens={**index.tokens, **tokens})
+        except orm.TransactionIntegrityError as e:
+            logger.exception(e)
@@ -5,6 +5,7 @@ from config import TELEGRAM_CHAT_ID
 from handlers.base import send_message
 from handlers.crypto import get_coin_stats
 from models import CryptoAlert
+from services.partition import owns
 
 
 async def price_alert_callback(delay: int) -> None:
@@ -17,6 +18,10 @@ async def price_alert_callback(delay: int) -> None:
 
     while True:
         for alert in CryptoAlert.all():
+            # Alerts are sharded by coin across replicas
+            if not owns(alert.coin_id):
+                continue
+
             crypto = alert.symbol
             sign = alert.sign
             price = alert.price
@@ -45,8 +50,9 @@ async def price_alert_callback(delay: int) -> None:
                 else:
                     response = f"👋 {crypto} has surpassed {price} and has just reached {spot_price}!"
 
-                alert.remove()
-                await send_message(channel_id=TELEGRAM_CHAT_ID, message=response)
+                # Alert was deleted or already sent by another replica
+                if CryptoAlert.claim(primary_key=alert.id):  # type: ignore
+                    await send_message(channel_id=TELEGRAM_CHAT_ID, message=response)
             await asyncio.sleep(2)
         await asyncio.sleep(delay)
 
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Optional, Set
+
+import websockets
+from web3 import Web3
+
+from api.rpc import run_sync
+from app import logger
+
+BLOCK_POLL_INTERVAL = 1
+WS_RECONNECT_DELAY = 30
+
+
+class BlockWatcher:
+    """
+    Emits one event per new chain head to every subscriber. Uses a websocket newHeads subscription when available
+    and falls back to polling the block number over HTTP
+    """
+
+    def __init__(
+        self,
+        network: str,
+        web3: Web3,
+        ws_url: Optional[str] = None,
+        poll_interval: float = BLOCK_POLL_INTERVAL,
+    ):
+        self.network = network
+        self.web3 = web3
+        self.ws_url = ws_url
+        self.poll_interval = poll_interval
+        self.block_number = 0
+        self.polled_at = 0.0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Subscribes to new chain heads. Queue only holds the latest block number, so slow subscribers skip stale
+        blocks instead of falling behind
+
+        Returns (asyncio.Queue): Queue receiving new block numbers
+
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.subscribers.add(queue)
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    async def blocks(self) -> AsyncIterator[int]:
+        """
+        Iterates over new chain heads
+
+        Returns (AsyncIterator[int]): New block numbers
+
+        """
+        queue = self.subscribe()
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(queue)
+
+    async def current_block_number(self) -> int:
+        """
+        Latest block number. Served from memory while the watcher is running, otherwise refreshed over HTTP at most
+        once per poll interval
+
+        Returns (int): Latest block number
+
+        """
+        now = time.monotonic()
+        is_watching = self.task is not None and not self.task.done()
+
+        if not is_watching and now - self.polled_at >= self.poll_interval:
+            self.publish(block_number=await run_sync(self.web3.eth.get_block_number))
+            self.polled_at = now
+        return self.block_number
+
+    def publish(self, block_number: int) -> None:
+        """
+        Dispatches block number to subscribers if it is a new chain head
+        Args:
+            block_number (int): Latest block number
+
+        """
+        if block_number <= self.block_number:
+            return
+        self.block_number = block_number
+
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(block_number)
+
+    async def _watch_new_heads(self) -> None:
+        async with websockets.connect(self.ws_url) as websocket:
+            await websocket.send(
+                json.dumps(
+                    {
+                        "id": 1,
+                        "jsonrpc": "2.0",
+                        "method": "eth_subscribe",
+                        "params": ["newHeads"],
+                    }
+                )
+            )
+            subscription = json.loads(await websocket.recv())
+
+            if "error" in subscription:
+                raise ValueError(subscription["error"])
+            logger.info("Subscribed to %s new heads", self.network)
+
+            async for message in websocket:
+                if not self.subscribers:
+                    break
+                head = json.loads(message)["params"]["result"]
+                self.publish(block_number=int(head["number"], 16))
+
+    async def _poll_block_number(self, duration: Optional[float] = None) -> None:
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + duration if duration else None
+
+        while self.subscribers and (deadline is None or loop.time() < deadline):
+            try:
+                self.publish(
+                    block_number=await run_sync(self.web3.eth.get_block_number)
+                )
+            except Exception as e:
+                logger.exception(e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self) -> None:
+        """Watches chain head while there are subscribers"""
+        logger.info("Watching %s chain head", self.network)
+
+        while self.subscribers:
+            if not self.ws_url:
+                await self._poll_block_number()
+                continue
+            try:
+                await self._watch_new_heads()
+            except Exception as e:
+                # Subscribers wait on this task, so no error from the node may end it
+                logger.exception(e)
+
+                # Poll over HTTP while the websocket endpoint is unavailable
+                await self._poll_block_number(duration=WS_RECONNECT_DELAY)
+        logger.info("Stopped watching %s chain head", self.network)
+
+
+block_watchers: Dict[str, BlockWatcher] = {}
+
+
+def get_block_watcher(
+    network: str, web3: Web3, ws_url: Optional[str] = None
+) -> BlockWatcher:
+    """
+    Retrieves the shared chain head watcher of a network
+    Args:
+        network (str): Network name
+        web3 (Web3): Web3 instance used for HTTP polling fallback
+        ws_url (str): Websocket endpoint for newHeads subscription
+
+    Returns (BlockWatcher): Chain head watcher
+
+    """
+    if network not in block_watchers:
+        block_watchers[network] = BlockWatcher(
+            network=network, web3=web3, ws_url=ws_url
+        )
+    return block_watchers[network]
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from statistics import median
+from typing import Dict
+
+from pydantic import BaseModel
+from requests.exceptions import RequestException
+from web3 import Web3
+from web3.types import Wei
+
+from api.rpc import batch_request, get_web3
+from app import logger
+from config import (
+    BINANCE_SMART_CHAIN_URLS,
+    ETHEREUM_MAIN_NET_URLS,
+    GAS_ORACLE_INTERVAL,
+    MATIC_CHAIN_URLS,
+)
+
+SPEEDS = ("slow", "average", "fast", "fastest")
+
+# Priority fee percentiles of recent blocks used for each speed
+REWARD_PERCENTILES = [10, 50, 75, 90]
+FEE_HISTORY_BLOCKS = 20
+
+# Base fee rises at most 12.5% per block, doubling it keeps transactions valid through several full blocks
+BASE_FEE_MULTIPLIER = 2
+
+NETWORK_URLS = {
+    "BSC": BINANCE_SMART_CHAIN_URLS,
+    "ETH": ETHEREUM_MAIN_NET_URLS,
+    "MATIC": MATIC_CHAIN_URLS,
+}
+EIP1559_NETWORKS = {"ETH", "MATIC"}
+
+# Polygon validators reject transactions tipping less than 30 gwei
+MIN_PRIORITY_FEES = {"MATIC": Web3.toWei(30, "gwei")}
+
+
+class GasPrices(BaseModel):
+    network: str
+    base_fee: int
+    node_gas_price: int
+    priority_fees: Dict[str, int]
+    updated_at: float
+
+    def gas_price(self, speed: str) -> Wei:
+        """
+        Legacy gas price
+        Args:
+            speed (str): Transaction speed
+
+        Returns (Wei): Gas price
+
+        """
+        return Wei(max(self.base_fee + self.priority_fees[speed], self.node_gas_price))
+
+    def transaction_fees(self, speed: str) -> dict:
+        """
+        Gas fee fields of a transaction. EIP-1559 fees on chains supporting them, legacy gas price otherwise
+        Args:
+            speed (str): Transaction speed
+
+        Returns (dict): Transaction fee fields
+
+        """
+        if self.network not in EIP1559_NETWORKS:
+            return {"gasPrice": self.gas_price(speed=speed)}
+        priority_fee = self.priority_fees[speed]
+        return {
+            "maxFeePerGas": Wei(BASE_FEE_MULTIPLIER * self.base_fee + priority_fee),
+            "maxPriorityFeePerGas": Wei(priority_fee),
+        }
+
+
+class GasOracle:
+    """
+    Keeps gas price suggestions of every chain in memory. Suggestions are computed locally from eth_feeHistory
+    priority fee percentiles & refreshed in the background
+    """
+
+    def __init__(self, interval: float = GAS_ORACLE_INTERVAL):
+        self.interval = interval
+        self.prices: Dict[str, GasPrices] = {}
+
+    async def refresh(self, network: str) -> GasPrices:
+        """
+        Recomputes gas price suggestions of network. Fee history & node gas price share one JSON-RPC batch
+        Args:
+            network (str): Network name
+
+        Returns (GasPrices): Gas price suggestions
+
+        """
+        web3 = get_web3(network=network, urls=NETWORK_URLS[network])
+        fee_history, node_gas_price = await asyncio.gather(
+            batch_request(
+                web3=web3,
+                method="eth_feeHistory",
+                params=[hex(FEE_HISTORY_BLOCKS), "latest", REWARD_PERCENTILES],
+            ),
+            batch_request(web3=web3, method="eth_gasPrice", params=[]),
+            return_exceptions=True,
+        )
+
+        if isinstance(node_gas_price, Exception):
+            raise node_gas_price
+        node_gas_price = int(node_gas_price, 16)
+        base_fee = 0
+        rewards = []
+
+        if isinstance(fee_history, Exception):
+            # Node doesn't serve fee history, node gas price is used for every speed
+            logger.warning("Fee history of %s unavailable: %s", network, fee_history)
+        else:
+            base_fee = int(fee_history["baseFeePerGas"][-1], 16)
+            rewards = [
+                [int(reward, 16) for reward in block]
+                for block in fee_history.get("reward") or []
+            ]
+        min_priority_fee = MIN_PRIORITY_FEES.get(network, 0)
+        priority_fees = {
+            speed: max(
+                int(median(block[index] for block in rewards)) if rewards else 0,
+                min_priority_fee,
+            )
+            for index, speed in enumerate(SPEEDS)
+        }
+        self.prices[network] = GasPrices(
+            network=network,
+            base_fee=base_fee,
+            node_gas_price=node_gas_price,
+            priority_fees=priority_fees,
+            updated_at=time.time(),
+        )
+        return self.prices[network]
+
+    async def get_gas_prices(self, network: str) -> GasPrices:
+        """
+        Retrieves gas price suggestions of network from memory. Suggestions are only fetched on demand when the
+        background refresh has not caught up yet
+        Args:
+            network (str): Network name
+
+        Returns (GasPrices): Gas price suggestions
+
+        """
+        prices = self.prices.get(network)
+
+        if prices is None or time.time() - prices.updated_at > 4 * self.interval:
+            prices = await self.refresh(network=network)
+        return prices
+
+    async def run(self) -> None:
+        """Refreshes gas price suggestions of every chain"""
+        while True:
+            results = await asyncio.gather(
+                *(self.refresh(network=network) for network in NETWORK_URLS),
+                return_exceptions=True,
+            )
+
+            for network, result in zip(NETWORK_URLS, results):
+                if isinstance(result, (RequestException, ValueError)):
+                    logger.warning(
+                        "Unable to refresh %s gas prices: %s", network, result
+                    )
+                elif isinstance(result, Exception):
+                    logger.exception(result)
+            await asyncio.sleep(self.interval)
+
+
+gas_oracle = GasOracle()
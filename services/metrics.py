@@ -0,0 +1,69 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Deque, Dict
+
+from app import logger
+
+METRIC_WINDOW = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+LOOP_LAG_INTERVAL = 0.5
+LOOP_LAG_WARNING = 0.1
+
+observations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=METRIC_WINDOW))
+totals: Dict[str, list] = defaultdict(lambda: [0, 0.0])
+
+
+def observe(name: str, value: float) -> None:
+    """
+    Records a metric observation
+    Args:
+        name (str): Metric name
+        value (float): Observed value
+
+    """
+    observations[name].append(value)
+    totals[name][0] += 1
+    totals[name][1] += value
+
+
+def render() -> str:
+    """
+    Renders recorded metrics as summaries in Prometheus text format. Quantiles are computed over the latest
+    observations
+
+    Returns (str): Metrics exposition
+
+    """
+    lines = []
+
+    for name, values in sorted(observations.items()):
+        count, total = totals[name]
+        ordered = sorted(values)
+        lines.append(f"# TYPE {name} summary")
+
+        for quantile in QUANTILES:
+            value = ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+            lines.append(f'{name}{{quantile="{quantile}"}} {value}')
+        lines.append(f"{name}_sum {total}")
+        lines.append(f"{name}_count {count}")
+    return "\n".join(lines) + "\n"
+
+
+async def monitor_event_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """
+    Measures how late the event loop wakes up from a fixed sleep. Any blocking call on the loop shows up as lag in
+    event_loop_lag_seconds
+    Args:
+        interval (float): Seconds between measurements
+
+    """
+    loop = asyncio.get_running_loop()
+
+    while True:
+        started_at = loop.time()
+        await asyncio.sleep(interval)
+        lag = loop.time() - started_at - interval
+        observe(name="event_loop_lag_seconds", value=lag)
+
+        if lag > LOOP_LAG_WARNING:
+            logger.warning("Event loop blocked for %.3fs", lag)
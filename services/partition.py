@@ -0,0 +1,78 @@
+import asyncio
+import zlib
+from typing import Awaitable, Callable, Set, Union
+
+from pony.orm import DatabaseError, OrmError
+
+from app import logger
+from config import SHARD_COUNT, SHARD_LEASE_TTL, WORKER_ID
+from models import ShardLease
+
+owned_shards: Set[int] = set()
+
+
+def shard_for(key: Union[int, str]) -> int:
+    """
+    Maps a work item key to its shard
+    Args:
+        key (Union[int, str]): Order id or coin id
+
+    Returns (int): Shard number
+
+    """
+    if isinstance(key, int):
+        return key % SHARD_COUNT
+    return zlib.crc32(key.encode()) % SHARD_COUNT
+
+
+def owns(key: Union[int, str]) -> bool:
+    """
+    Verifies work item belongs to a shard leased by this replica
+    Args:
+        key (Union[int, str]): Order id or coin id
+
+    Returns (bool): True if this replica should process the work item
+
+    """
+    return shard_for(key) in owned_shards
+
+
+async def lease_keeper(
+    on_renew: Callable[[Set[int]], Awaitable[None]],
+    interval: int = max(SHARD_LEASE_TTL // 3, 1),
+) -> None:
+    """
+    Repetitive task that renews shard leases, takes over shards of dead replicas and lets the caller pick up work
+    for owned shards
+
+    Args:
+        on_renew (Callable): Coroutine called with the owned shards after every renewal
+        interval (int): Interval of time to wait in seconds
+    """
+    while True:
+        try:
+            shards = ShardLease.acquire(
+                owner=WORKER_ID, shard_count=SHARD_COUNT, ttl=SHARD_LEASE_TTL
+            )
+        except (DatabaseError, OrmError) as e:
+            logger.exception(e)
+
+            # Leases can't be renewed, so stop processing before a peer takes over
+            shards = set()
+
+        if shards != owned_shards:
+            logger.info(
+                "Replica %s now owns shards %s", WORKER_ID, sorted(shards) or "none"
+            )
+            owned_shards.clear()
+            owned_shards.update(shards)
+
+        if owned_shards:
+            await on_renew(owned_shards)
+        await asyncio.sleep(interval)
+
+
+def release_leases() -> None:
+    """Releases shards owned by this replica"""
+    owned_shards.clear()
+    ShardLease.release(owner=WORKER_ID)
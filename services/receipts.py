@@ -0,0 +1,175 @@
+import asyncio
+from typing import Dict, Optional, Set
+
+from aiogram.utils.markdown import link
+from requests.exceptions import RequestException
+from web3 import Web3
+
+from api.rpc import RPCTimeoutError, run_sync
+from app import logger
+from handlers.base import send_message
+from services.block_watcher import BlockWatcher
+
+RECEIPT_TIMEOUT = 60 * 10
+
+
+class PendingTransaction:
+    def __init__(
+        self,
+        future: asyncio.Future,
+        deadline: float,
+        chat_id: Optional[int] = None,
+        description: str = "Transaction",
+    ):
+        self.future = future
+        self.deadline = deadline
+        self.chat_id = chat_id
+        self.description = description
+
+
+class ReceiptTracker:
+    """
+    Tracks pending transactions of a network. Receipts of every pending transaction are fetched in a single JSON-RPC
+    batch per block
+    """
+
+    def __init__(
+        self, network: str, web3: Web3, block_watcher: BlockWatcher, explorer_url: str
+    ):
+        self.network = network
+        self.web3 = web3
+        self.block_watcher = block_watcher
+        self.explorer_url = explorer_url
+        self.pending: Dict[str, PendingTransaction] = {}
+        self.task: Optional[asyncio.Task] = None
+
+        # Follow-ups being sent are referenced so they aren't garbage collected before completing
+        self.notifications: Set[asyncio.Task] = set()
+
+    def track(
+        self,
+        txn_hash: str,
+        chat_id: Optional[int] = None,
+        description: str = "Transaction",
+        timeout: float = RECEIPT_TIMEOUT,
+    ) -> asyncio.Future:
+        """
+        Starts tracking transaction
+        Args:
+            txn_hash (str): Transaction hash
+            chat_id (int): Telegram chat to notify once transaction is mined or fails. No follow-up if not provided
+            description (str): Transaction description used in follow-up message
+            timeout (float): Seconds to wait for transaction to be mined
+
+        Returns (asyncio.Future): Resolves to raw transaction receipt
+
+        """
+        loop = asyncio.get_running_loop()
+
+        if txn_hash not in self.pending:
+            future = loop.create_future()
+
+            # Callers may rely on the Telegram follow-up alone & never await the receipt
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self.pending[txn_hash] = PendingTransaction(
+                future=future,
+                deadline=loop.time() + timeout,
+                chat_id=chat_id,
+                description=description,
+            )
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.pending[txn_hash].future
+
+    def notify(
+        self, transaction: PendingTransaction, txn_hash: str, status: str
+    ) -> None:
+        if transaction.chat_id is None:
+            return
+        txn_hash_url = f"{self.explorer_url}/tx/{txn_hash}"
+        message = f"{status}. {link(title='View Transaction', url=txn_hash_url)}"
+        task = asyncio.create_task(
+            send_message(channel_id=transaction.chat_id, message=message)
+        )
+        self.notifications.add(task)
+        task.add_done_callback(self.notifications.discard)
+
+    async def poll(self) -> None:
+        """Fetches receipts of every pending transaction in one batch & resolves mined transactions"""
+        txn_hashes = list(self.pending)
+        responses = await run_sync(
+            self.web3.provider.make_batch_request,
+            [("eth_getTransactionReceipt", [txn_hash]) for txn_hash in txn_hashes],
+        )
+        now = asyncio.get_running_loop().time()
+
+        for txn_hash, response in zip(txn_hashes, responses):
+            transaction = self.pending[txn_hash]
+            receipt = response.get("result") if response else None
+
+            if receipt is None:
+                if now >= transaction.deadline:
+                    del self.pending[txn_hash]
+                    self.notify(
+                        transaction=transaction,
+                        txn_hash=txn_hash,
+                        status=f"⚠ {transaction.description} is still pending",
+                    )
+                    if not transaction.future.done():
+                        transaction.future.set_exception(
+                            RPCTimeoutError(
+                                f"Transaction {txn_hash} was not mined in time"
+                            )
+                        )
+                continue
+            del self.pending[txn_hash]
+            block_number = int(receipt["blockNumber"], 16)
+
+            status = (
+                f"✅ {transaction.description} confirmed in block {block_number}"
+                if int(receipt["status"], 16) == 1
+                else f"❌ {transaction.description} failed in block {block_number}"
+            )
+            logger.info("%s: %s", txn_hash, status)
+            self.notify(transaction=transaction, txn_hash=txn_hash, status=status)
+
+            if not transaction.future.done():
+                transaction.future.set_result(receipt)
+
+    async def run(self) -> None:
+        """Polls pending receipts on every new block while there are pending transactions"""
+        async for _ in self.block_watcher.blocks():
+            if not self.pending:
+                break
+            try:
+                await self.poll()
+            except (RequestException, ValueError) as e:
+                logger.exception(e)
+
+
+receipt_trackers: Dict[str, ReceiptTracker] = {}
+
+
+def get_receipt_tracker(
+    network: str, web3: Web3, block_watcher: BlockWatcher, explorer_url: str
+) -> ReceiptTracker:
+    """
+    Retrieves the shared receipt tracker of a network
+    Args:
+        network (str): Network name
+        web3 (Web3): Web3 instance of network
+        block_watcher (BlockWatcher): Chain head watcher of network
+        explorer_url (str): Block explorer URL used to link transactions
+
+    Returns (ReceiptTracker): Receipt tracker
+
+    """
+    if network not in receipt_trackers:
+        receipt_trackers[network] = ReceiptTracker(
+            network=network,
+            web3=web3,
+            block_watcher=block_watcher,
+            explorer_url=explorer_url,
+        )
+    return receipt_trackers[network]
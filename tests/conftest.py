@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Iterator, Optional
+
+import pytest
+import websockets
+
+# Settings read at import time by config & app, tests never reach Telegram or ngrok
+os.environ.setdefault("ENV", "test")
+os.environ.setdefault("USE_NGROK", "0")
+os.environ.setdefault("FERNET_KEY", "R3JfMXBvYl9oT0lGcUNoVHNhV0ZsbEt1WHBpWE5uTGU=")
+os.environ.setdefault(
+    "TELEGRAM_BOT_API_KEY", "123456789:TEST-TOKEN-TEST-TOKEN-TEST-TOKEN-TEST"
+)
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
+
+
+class DevChain:
+    """
+    Local stand-in for a chain node. Serves eth_blockNumber over HTTP & pushes newHeads to websocket subscribers,
+    so chain head watching can be tested without a real node
+    """
+
+    def __init__(self, block_number: int = 1):
+        self.block_number = block_number
+        self.http_requests = 0
+        self.failures = 0
+        self.latency = 0.0
+        self.heads: Optional[asyncio.Queue] = None
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.http_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _handler(self) -> type:
+        chain = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                request = json.loads(
+                    self.rfile.read(int(self.headers["Content-Length"]))
+                )
+                chain.http_requests += 1
+
+                if chain.failures:
+                    chain.failures -= 1
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if chain.latency:
+                    threading.Event().wait(chain.latency)
+                body = json.dumps(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": request["id"],
+                        "result": hex(chain.block_number),
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def mine(self, blocks: int = 1) -> int:
+        """
+        Moves chain head forward, notifying websocket subscribers
+        Args:
+            blocks (int): Amount of blocks to mine
+
+        Returns (int): New block number
+
+        """
+        self.block_number += blocks
+
+        if self.heads is not None:
+            self.heads.put_nowait(self.block_number)
+        return self.block_number
+
+    @asynccontextmanager
+    async def new_heads(self) -> AsyncIterator[str]:
+        """
+        Serves eth_subscribe newHeads over websocket while open
+
+        Returns (AsyncIterator[str]): Websocket url
+
+        """
+        self.heads = asyncio.Queue()
+
+        async def subscription(websocket, path=None) -> None:
+            request = json.loads(await websocket.recv())
+            await websocket.send(
+                json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": "0x1"})
+            )
+
+            while True:
+                block_number = await self.heads.get()  # type: ignore
+
+                if block_number is None:
+                    return
+                if isinstance(block_number, str):
+                    # Raw message, e.g. a malformed notification
+                    await websocket.send(block_number)
+                    continue
+                await websocket.send(
+                    json.dumps(
+                        {
+                            "jsonrpc": "2.0",
+                            "method": "eth_subscription",
+                            "params": {
+                                "subscription": "0x1",
+                                "result": {"number": hex(block_number)},
+                            },
+                        }
+                    )
+                )
+
+        server = await websockets.serve(subscription, "127.0.0.1", 0)
+        try:
+            port = server.sockets[0].getsockname()[1]
+            yield f"ws://127.0.0.1:{port}"
+        finally:
+            # Handlers must return before the server can close
+            self.heads.put_nowait(None)
+            server.close()
+            await asyncio.wait_for(server.wait_closed(), timeout=5)
+            self.heads = None
+
+
+@pytest.fixture
+def dev_chain() -> Iterator[DevChain]:
+    chain = DevChain()
+    thread = threading.Thread(target=chain.server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield chain
+    finally:
+        chain.server.shutdown()
+        chain.server.server_close()
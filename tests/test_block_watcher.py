@@ -0,0 +1,135 @@
+import asyncio
+import sys
+
+import pytest
+from web3 import Web3
+from websockets.version import version as websockets_version
+
+from services.block_watcher import BlockWatcher
+
+TIMEOUT = 5
+
+# websockets 9 passes the removed loop argument to asyncio, so it can't serve or connect on Python 3.10+. The watcher
+# falls back to polling there, which the other tests cover
+requires_websockets = pytest.mark.skipif(
+    sys.version_info >= (3, 10) and int(websockets_version.split(".")[0]) < 10,
+    reason="websockets < 10 doesn't run on Python 3.10+",
+)
+
+
+def make_watcher(dev_chain, ws_url=None) -> BlockWatcher:
+    return BlockWatcher(
+        network="DEV",
+        web3=Web3(Web3.HTTPProvider(dev_chain.http_url)),
+        ws_url=ws_url,
+        poll_interval=0.01,
+    )
+
+
+async def next_block(blocks) -> int:
+    return await asyncio.wait_for(blocks.__anext__(), timeout=TIMEOUT)
+
+
+def test_polling_emits_new_heads(dev_chain):
+    async def scenario():
+        watcher = make_watcher(dev_chain)
+        blocks = watcher.blocks()
+
+        assert await next_block(blocks) == dev_chain.block_number
+        block_number = dev_chain.mine()
+        assert await next_block(blocks) == block_number
+        await blocks.aclose()
+
+        # Watcher stops once its last subscriber leaves
+        await asyncio.wait_for(watcher.task, timeout=TIMEOUT)  # type: ignore
+        assert not watcher.subscribers
+
+    asyncio.run(scenario())
+
+
+def test_polling_survives_node_errors(dev_chain):
+    async def scenario():
+        dev_chain.failures = 2
+        watcher = make_watcher(dev_chain)
+        blocks = watcher.blocks()
+
+        assert await next_block(blocks) == dev_chain.block_number
+        assert dev_chain.http_requests >= 3
+        await blocks.aclose()
+
+    asyncio.run(scenario())
+
+
+@requires_websockets
+def test_new_heads_subscription(dev_chain):
+    async def scenario():
+        async with dev_chain.new_heads() as ws_url:
+            watcher = make_watcher(dev_chain, ws_url=ws_url)
+            blocks = watcher.blocks()
+
+            for _ in range(2):
+                block_number = dev_chain.mine()
+                assert await next_block(blocks) == block_number
+            await blocks.aclose()
+
+        # Heads are pushed, chain is never polled
+        assert dev_chain.http_requests == 0
+
+    asyncio.run(scenario())
+
+
+def test_falls_back_to_polling_when_websocket_is_down(dev_chain):
+    async def scenario():
+        watcher = make_watcher(dev_chain, ws_url="ws://127.0.0.1:1")
+        blocks = watcher.blocks()
+
+        assert await next_block(blocks) == dev_chain.block_number
+        assert dev_chain.http_requests >= 1
+        await blocks.aclose()
+
+    asyncio.run(scenario())
+
+
+@requires_websockets
+def test_falls_back_to_polling_on_malformed_head(dev_chain):
+    async def scenario():
+        async with dev_chain.new_heads() as ws_url:
+            watcher = make_watcher(dev_chain, ws_url=ws_url)
+            blocks = watcher.blocks()
+            dev_chain.heads.put_nowait(
+                '{"jsonrpc": "2.0", "method": "eth_subscription", "params": null}'
+            )
+
+            assert await next_block(blocks) == dev_chain.block_number
+            assert not watcher.task.done()  # type: ignore
+            await blocks.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_only_sees_latest_head(dev_chain):
+    async def scenario():
+        watcher = make_watcher(dev_chain)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        watcher.subscribers.add(queue)
+
+        for block_number in (5, 6, 7, 6):
+            watcher.publish(block_number=block_number)
+
+        assert queue.get_nowait() == 7
+        assert queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_current_block_number_polls_at_most_once_per_interval(dev_chain):
+    async def scenario():
+        watcher = make_watcher(dev_chain)
+        watcher.poll_interval = 60
+
+        assert await watcher.current_block_number() == dev_chain.block_number
+        dev_chain.mine()
+        assert await watcher.current_block_number() == dev_chain.block_number - 1
+        assert dev_chain.http_requests == 1
+
+    asyncio.run(scenario())
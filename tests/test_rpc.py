@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from web3 import Web3
+
+from api.rpc import run_sync
+
+NODE_LATENCY = 0.2
+HEARTBEAT_INTERVAL = 0.01
+
+
+async def max_event_loop_lag(call: Callable[[], Awaitable]) -> float:
+    """
+    Measures how late a heartbeat wakes up while call runs, i.e. how long the event loop was blocked
+    Args:
+        call (Callable): Coroutine function to measure
+
+    Returns (float): Largest heartbeat delay in seconds
+
+    """
+    lag = 0.0
+    running = True
+
+    async def heartbeat():
+        nonlocal lag
+
+        while running:
+            started_at = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            lag = max(lag, time.perf_counter() - started_at - HEARTBEAT_INTERVAL)
+
+    task = asyncio.create_task(heartbeat())
+    await asyncio.sleep(HEARTBEAT_INTERVAL)
+    await asyncio.gather(*(call() for _ in range(5)))
+    running = False
+    await task
+    return lag
+
+
+def test_run_sync_keeps_event_loop_responsive(dev_chain):
+    dev_chain.latency = NODE_LATENCY
+    web3 = Web3(Web3.HTTPProvider(dev_chain.http_url))
+
+    async def blocking_call():
+        return web3.eth.get_block_number()
+
+    async def offloaded_call():
+        return await run_sync(web3.eth.get_block_number)
+
+    async def scenario():
+        return (
+            await max_event_loop_lag(blocking_call),
+            await max_event_loop_lag(offloaded_call),
+        )
+
+    blocking_lag, offloaded_lag = asyncio.run(scenario())
+    lags = f"blocking {blocking_lag:.3f}s, run_sync {offloaded_lag:.3f}s"
+
+    # Blocking calls stall the loop for every round trip, offloaded calls don't stall it at all
+    assert blocking_lag >= NODE_LATENCY, lags
+    assert offloaded_lag < NODE_LATENCY / 2, lags